@@ -6,7 +6,9 @@ import wxbuild.components.styles_colors as wxcolors
 import demos.demo1.threaded_function_test as thread_func
 
 import numpy as np
+import tempfile
 import time
+import os
 
 
 class Master(master.Master):
@@ -36,6 +38,9 @@ class Master(master.Master):
         self.plt_set = 0
 
         self.test_thread_indx = wx.NewIdRef()
+        self.dataset_path = os.path.join(tempfile.gettempdir(), 'wxbuild_demo_recording.npy')
+        self.dataset_state = ''  # '', 'writing' or 'opened'
+        self.dataset_thread_index = wx.NewIdRef()
 
     def post_init(self):
         print("\n-- POST Initiation of Master --\n")
@@ -104,6 +109,10 @@ class Master(master.Master):
             if name == 'main':
                 self.main_frame.vispy_plot.Show()
                 self.main_frame.rich_text.Hide()
+            elif name == 'dataset':
+                self.open_dataset()
+                self.main_frame.vispy_plot.Show()
+                self.main_frame.rich_text.Hide()
             elif name == 'log':
                 if self.main_frame.rich_text.IsShown():
                     self.update_rich_text_bool = True
@@ -138,25 +147,31 @@ class Master(master.Master):
         #
         self.main_frame.vispy_plot.add_vertical_line(view_index=0, pos=0.5)
         self.main_frame.vispy_plot.add_vertical_line(view_index=1, pos=0.5)
-        self.main_frame.vispy_plot.add_line_set(view_index=0, n_lines=2, n_per_line=self.plt_n)
-        self.main_frame.vispy_plot.add_line_set(view_index=1, n_lines=2, n_per_line=self.plt_n)
+        self.main_frame.vispy_plot.add_line_set(
+            view_index=0, n_lines=2, n_per_line=self.plt_n, dt=t[1], stacked=True, spacing=2
+        )
+        self.main_frame.vispy_plot.add_line_set(
+            view_index=1, n_lines=2, n_per_line=self.plt_n, dt=t[1], stacked=True, spacing=2
+        )
 
-        y0 = np.roll(self.plt_data, - self.plt_pointer)[:self.plt_n]
-        y1 = np.roll(self.plt_data, - self.plt_pointer)[:self.plt_n] + 2
+        y0 = self.plt_data[:self.plt_n]
+        y1 = self.plt_data[:self.plt_n]
         # self.main_frame.vispy_plot.update_line(y_data=y0, line_index=0)
         # self.main_frame.vispy_plot.update_line(y_data=y1, line_index=1)
-        self.main_frame.vispy_plot.update_line(line_index=0, view_index=0, y_data=y0, x_data=t[:self.plt_n], color=wxcolors.ColorsCyclic.get_color())
-        self.main_frame.vispy_plot.update_line(line_index=1, view_index=0, y_data=y1, x_data=t[:self.plt_n], color=wxcolors.ColorsCyclic.get_color())
-        self.main_frame.vispy_plot.update_line(line_index=0, view_index=1, y_data=y0, x_data=t[:self.plt_n], color=wxcolors.ColorsCyclic.get_color())
-        self.main_frame.vispy_plot.update_line(line_index=1, view_index=1, y_data=y1, x_data=t[:self.plt_n], color=wxcolors.ColorsCyclic.get_color())
+        self.main_frame.vispy_plot.update_line(line_index=0, view_index=0, y_data=y0, color=wxcolors.ColorsCyclic.get_color())
+        self.main_frame.vispy_plot.update_line(line_index=1, view_index=0, y_data=y1, color=wxcolors.ColorsCyclic.get_color())
+        self.main_frame.vispy_plot.update_line(line_index=0, view_index=1, y_data=y0, color=wxcolors.ColorsCyclic.get_color())
+        self.main_frame.vispy_plot.update_line(line_index=1, view_index=1, y_data=y1, color=wxcolors.ColorsCyclic.get_color())
+
+        self.plt_pointer = self.plt_n
 
     def update_vispy_plots(self):
         # print("# update vispy buffers", time.strftime("%M:%S", time.localtime()))
-        y0 = np.roll(self.plt_data, - self.plt_pointer)[:self.plt_n - self.plt_n//2 * self.plt_set]
-        y1 = np.roll(self.plt_data, - self.plt_pointer)[:self.plt_n - self.plt_n//2 * self.plt_set] + 2
-        self.main_frame.vispy_plot.update_line(y_data=y0, line_index=0, view_index=self.plt_set)
-        self.main_frame.vispy_plot.update_line(y_data=y1, line_index=1, view_index=self.plt_set)
-        self.plt_pointer = self.plt_pointer + 50
+        n_new = 50
+        y_new = self.plt_data[np.arange(self.plt_pointer, self.plt_pointer + n_new) % self.plt_data.size]
+        self.main_frame.vispy_plot.append_samples(view_index=self.plt_set, line_index=0, samples=y_new)
+        self.main_frame.vispy_plot.append_samples(view_index=self.plt_set, line_index=1, samples=y_new)
+        self.plt_pointer = (self.plt_pointer + n_new) % self.plt_data.size
 
     def update_vispy_buffers(self):
         # y0 = np.roll(self.plt_data, - self.plt_pointer)[:self.plt_n - self.plt_n//2 * self.plt_set]
@@ -167,6 +182,43 @@ class Master(master.Master):
         # self.main_frame.vispy_plot.update_line(y_data=y0, line_index=0)
         # self.main_frame.vispy_plot.update_line(y_data=y1, line_index=1)
 
+    def open_dataset(self):
+        # A long recording shown in the third view straight from disk. The stand-in capture is written once by a
+        # worker thread, the page opens it when that is done
+        if self.dataset_state != '':
+            return
+        if os.path.exists(self.dataset_path):
+            self.handle_dataset_written(None)
+            return
+        self.dataset_state = 'writing'
+        self.main_frame.init_thread_worker(
+            worker_id=self.dataset_thread_index,
+            run_func=self.write_dataset,
+            run_once=True,
+            callback_func=self.handle_dataset_written,
+            kwargs={'path': self.dataset_path},
+        )
+
+    def handle_dataset_written(self, event):
+        self.main_frame.vispy_plot.open_recording(self.dataset_path, view_index=2, sample_rate=250e3)
+        self.dataset_state = 'opened'
+
+    @staticmethod
+    def write_dataset(path, n_samples=30_000_000, chunk=2**20, thread_instance=None):
+        print(" writing demo recording:", path)
+        # Written under a temporary name, an interrupted run leaves no half written recording behind
+        temp_path = path + '.part.npy'
+        data = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32, shape=(n_samples, 2))
+        for start in range(0, n_samples, chunk):
+            t = np.arange(start, min(start + chunk, n_samples)) / 250e3
+            data[start:start + chunk, 0] = np.sin(2*np.pi*50*t) * (1 + 0.5 * np.sin(2*np.pi*0.01*t))
+            noise = 0.05 * np.random.standard_normal(t.size)
+            data[start:start + chunk, 1] = 0.3 * np.sign(np.sin(2*np.pi*0.2*t)) + noise
+        data.flush()
+        del data
+        os.replace(temp_path, path)
+        return path
+
     def zoom_home_vispy(self):
         self.main_frame.vispy_plot.zoom_axis_home()
 
@@ -392,7 +392,7 @@ page_select_panel = WxComponents.panel(
 vispy_panel = WxComponents.vispypanel(
     parent='main_frame',
     name='vispy_plot',
-    shape=(1, 2),
+    shape=(1, 3),
     size=(50, 50),
 )
 richtext_panel = WxComponents.richtext(
@@ -400,6 +400,7 @@ richtext_panel = WxComponents.richtext(
     name='rich_text',
     shape=(2, 1),
     size=(10, 10),
+    virtual_log=True,
     sizer_flags=wx.EXPAND,
     sizer_proportion=1,
 )
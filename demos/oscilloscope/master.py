@@ -0,0 +1,185 @@
+import wx
+
+import wxbuild.master_abstract as master
+import wxbuild.components.styles_colors as wxcolors
+from wxbuild.components.signal_processing import StftEngine, EdgeTrigger
+
+import numpy as np
+import time
+
+
+class Master(master.Master):
+    def __init__(self, main_frame):
+        self.main_frame = main_frame
+
+        self.sample_rate = 250e3
+        self.n_channels = 4
+        self.n_per_line = 4096
+        self.signal_frequencies = np.array([1e3, 4e3, 12.5e3, 25e3])
+        self.sample_counter = 0
+        self.last_sample_time = None
+
+        self.show_fft = True
+        self.show_spectrogram = False
+        self.n_fft = 1024
+        self.n_spectrogram_columns = 400
+        self.stft = StftEngine(
+            self.n_channels, n_fft=self.n_fft, overlap=0.5, n_average=4, sample_rate=self.sample_rate
+        )
+        self.stft_thread_index = wx.NewIdRef()
+        self.stft_updates = 0
+
+        # Triggered display, segments of n_per_line samples with a quarter of them before the trigger
+        self.trigger_enabled = False
+        self.trigger = EdgeTrigger(
+            self.n_channels, pre_trigger=self.n_per_line // 4, post_trigger=self.n_per_line - self.n_per_line // 4,
+            level=5.0, hysteresis=0.05,
+        )
+        self.show_persistence = False
+
+    def post_init(self):
+        self.main_frame.add_timer(interval=100)
+        self.init_vispy_plots()
+        self.main_frame.add_idle_function(func=self.acquire_samples, timeout=50)
+        self.main_frame.init_thread_worker(
+            worker_id=self.stft_thread_index,
+            run_func=self.stft.run_worker,
+            run_once=False,
+            callback_func=self.handle_stft_result,
+            sleep_time=0.02,
+        )
+
+    def handle_user_event(self, event_type, name, panel):
+        if panel == 'controls':
+            if name.startswith('channel_'):
+                # Channel buttons only flip the line's visibility in the shader table, time and spectrum view
+                channel = int(name.split('_')[-1]) - 1
+                visible = self.main_frame.vispy_plot.toggle_line(channel, view_index=0)
+                self.main_frame.vispy_plot.set_line_visible(channel, visible, view_index=1)
+            elif name == 'acquisition_mode':
+                # Bound before the state update of the widget, so read the choice itself
+                widget = self.main_frame.get_widget_by_names(widget_name=name, panel_name=panel)
+                mode = widget.wx_widget.input_element.GetStringSelection()
+                self.main_frame.vispy_plot.set_acquisition_mode(0, mode)
+            elif name == 'trigger_value' and event_type == 'toggle_input_field':
+                self.toggle_trigger()
+            elif name == 'fft':
+                self.show_fft = not self.show_fft
+                self.select_spectrum_view()
+            elif name == 'spectrogram':
+                self.show_spectrogram = not self.show_spectrogram
+                self.select_spectrum_view()
+            elif name == 'persistence':
+                self.show_persistence = not self.show_persistence
+                self.main_frame.vispy_plot.images[0].visible = self.show_persistence
+                self.main_frame.vispy_plot.clear_persistence(0)
+
+    #
+    def init_vispy_plots(self):
+        plot = self.main_frame.vispy_plot
+        plot.add_line_set(view_index=0, n_lines=self.n_channels, n_per_line=self.n_per_line, dt=1 / self.sample_rate)
+        for i in range(self.n_channels):
+            plot.update_line(
+                line_index=i, view_index=0, y_data=np.zeros(self.n_per_line, dtype=np.float32),
+                color=wxcolors.ColorsCyclic.get_color(),
+            )
+
+        # The last 5 s of the streamed samples can be scrolled through while paused (space key)
+        plot.add_history(0, int(5 * self.sample_rate))
+
+        # Triggered segments go through the acquisition modes (peak hold, envelope, averaging)
+        plot.add_acquisition_modes(0, self.n_per_line)
+
+        # Persistence of the triggered segments, all channels, behind the traces
+        plot.add_persistence(
+            n_columns=1024, n_rows=256, view_index=0, decay_time=2.0,
+            x_range=(-self.trigger.pre_trigger / self.sample_rate, self.trigger.post_trigger / self.sample_rate),
+            y_range=(-1.5, 1.5),
+        )
+        plot.images[0].visible = self.show_persistence
+
+        # Spectrum lines and spectrogram share the second view, only one of them is shown at a time
+        plot.add_line_set(view_index=1, n_lines=self.n_channels, n_per_line=self.stft.n_bins)
+        for i in range(self.n_channels):
+            plot.update_line(
+                line_index=i, view_index=1, x_data=self.stft.frequencies, y_data=np.full(self.stft.n_bins, -150.0),
+                color=wxcolors.ColorsCyclic.get_color(),
+            )
+        history = self.n_spectrogram_columns * self.stft.hop * self.stft.n_average / self.sample_rate
+        plot.add_waterfall(
+            self.stft.n_bins, self.n_spectrogram_columns, view_index=1,
+            x_range=(-history, 0), y_range=(0, self.sample_rate / 2), clim=(-140, -20),
+        )
+        self.select_spectrum_view()
+
+    def select_spectrum_view(self):
+        plot = self.main_frame.vispy_plot
+        plot.lines[1].visible = self.show_fft
+        plot.images[1].visible = self.show_spectrogram and not self.show_fft
+        if plot.images[1].visible:
+            plot.view_boxes[1].camera.set_range(plot.images[1].x_range, plot.images[1].y_range, margin=0)
+        else:
+            plot.view_boxes[1].camera.set_range((0, self.sample_rate / 2), (-150, 0), margin=0.02)
+        plot.request_draw()
+
+    #
+    def acquire_samples(self):
+        # Stand-in for a digitizer, produces the samples of the time elapsed since the last call
+        now = time.perf_counter()
+        if self.last_sample_time is None:
+            self.last_sample_time = now
+            return
+        n_new = min(int((now - self.last_sample_time) * self.sample_rate), self.n_per_line * 4)
+        self.last_sample_time = now
+        if n_new == 0:
+            return
+
+        t = (self.sample_counter + np.arange(n_new)) / self.sample_rate
+        block = np.sin(2 * np.pi * self.signal_frequencies[:, np.newaxis] * t)
+        block += 0.05 * np.random.standard_normal(block.shape)
+        block = block.astype(np.float32)
+        self.sample_counter += n_new
+
+        if self.trigger_enabled:
+            self.show_triggered_segment(block)
+        else:
+            for i in range(self.n_channels):
+                self.main_frame.vispy_plot.append_samples(view_index=0, line_index=i, samples=block[i])
+        if self.show_fft or self.show_spectrogram:
+            self.stft.put(block)
+
+    def toggle_trigger(self):
+        self.trigger_enabled = not self.trigger_enabled
+        widget = self.main_frame.get_widget_by_names(widget_name='trigger_value', panel_name='controls')
+        if widget is not None:
+            try:
+                self.trigger.set_level(float(widget.wx_widget.get_value()))
+            except ValueError:
+                pass
+        self.trigger.reset()
+        print(f" trigger enabled: {self.trigger_enabled}, level: {self.trigger.level}")
+
+    def show_triggered_segment(self, block):
+        segments = self.trigger.process(block)
+        if len(segments) == 0:
+            return
+        if self.show_persistence:
+            self.main_frame.vispy_plot.add_persistence_segments(0, segments.reshape(-1, segments.shape[-1]))
+        # Every segment is one frame of the acquisition mode, x = 0 at the interpolated level crossing
+        x = np.arange(self.trigger.segment_length) - self.trigger.pre_trigger
+        for segment, fraction in zip(segments, self.trigger.trigger_fractions):
+            self.main_frame.vispy_plot.update_frame(0, segment, x=(x + fraction) / self.sample_rate)
+
+    def handle_stft_result(self, event):
+        spectra = event.data
+        if spectra is None or len(spectra) == 0:
+            return
+        plot = self.main_frame.vispy_plot
+        if self.show_fft:
+            plot.update_lines(1, spectra[-1], x=self.stft.frequencies)
+        if self.show_spectrogram:
+            plot.append_waterfall_columns(1, spectra[:, 0])
+
+        self.stft_updates += 1
+        if self.stft_updates % 100 == 0:
+            print(f" stft throughput: {self.stft.get_throughput() / 1e6:.1f} MS/s per channel")
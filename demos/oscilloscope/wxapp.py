@@ -1,4 +1,5 @@
 from wxbuild.components.mainframe import MainFrame, AppConfiguration, WxComponents
+import demos.oscilloscope.master as master
 
 from wx import App
 
@@ -14,6 +15,7 @@ def main():
     print("  --> app_config.asset_folder:: ", app_config.asset_folder)
 
     frm = MainFrame(app_config=app_config)
+    frm.master = master.Master(frm)
 
     layout_tuple = (
         control_panel,
@@ -26,7 +28,7 @@ def main():
     app.MainLoop()
 
 
-other_ctrl_button_labels = ('FFT', 'Hilbert', 'SNR', 'Spectrogram')
+other_ctrl_button_labels = ('FFT', 'Hilbert', 'SNR', 'Spectrogram', 'Persistence')
 control_panel = WxComponents.panel(
     parent='main_frame',
     name='controls',
@@ -66,7 +68,17 @@ control_panel = WxComponents.panel(
             style_theme=WxComponents.styles.toggle__on__off,
             value=5.0,
             size=(50, -1),
-        )
+        ),
+        WxComponents.spacer(20),
+        WxComponents.widget(
+            name='acquisition_mode',
+            widget_type=WxComponents.widgets.choice,
+            label='Acquisition',
+            style_theme=WxComponents.styles.black,
+            choices=['normal', 'peak_hold', 'envelope', 'average', 'exp_average'],
+            value='normal',
+            value_edit_function=True,
+        ),
     )
 )
 vispy_panel = WxComponents.vispypanel(
@@ -0,0 +1,89 @@
+import wx
+import numpy as np
+
+from wxbuild.components.data_buffers import LogLineStore
+
+
+class VirtualLogCtrl(wx.VListBox):
+    """
+    Owner drawn, virtual log view. Only the rows on screen are drawn, straight from the packed bytes of a
+    LogLineStore, so scrolling through millions of kept lines costs the same as through a hundred and the memory
+    is the raw text. Rows have one height, the font and colour of a row come from its line's format, see
+    set_format().
+
+    With newest_first the newest line is the top row, like RichtextPanel. A view scrolled away from the newest line
+    stays on the lines it shows while new ones arrive.
+    """
+    def __init__(self, parent, id=wx.ID_ANY, size=wx.DefaultSize, max_lines=10_000_000, max_bytes=1 << 30,
+                 newest_first=True, font=None):
+        wx.VListBox.__init__(self, parent, id, size=size)
+        self.lines = LogLineStore(max_lines=max_lines, max_bytes=max_bytes)
+        self.newest_first = newest_first
+        self.margin = 3
+
+        if font is None:
+            font = wx.Font(
+                pointSize=10, family=wx.FONTFAMILY_MODERN, style=wx.FONTSTYLE_NORMAL, weight=wx.FONTWEIGHT_MEDIUM,
+                underline=False, faceName="", encoding=wx.FONTENCODING_DEFAULT,
+            )
+        self.formats = {}  # format int => (wx.Font, wx.Colour)
+        self.row_height = 0
+        self.set_format(0, font, wx.BLACK)
+
+        self.SetBackgroundColour(wx.WHITE)
+        self.SetItemCount(0)
+
+    def set_format(self, format_int, font, colour):
+        """Font and colour of the lines with format format_int, the row height fits the largest font."""
+        self.formats[int(format_int)] = (font, wx.Colour(colour))
+        dc = wx.ClientDC(self)
+        dc.SetFont(font)
+        self.row_height = max(self.row_height, dc.GetTextExtent('Ag')[1] + 2)
+
+    def add_text(self, text, formats=0):
+        """Append the lines of text (str, bytes or np.ubyte array), see LogLineStore.append_block() => lines added."""
+        if isinstance(text, str):
+            text = text.encode('utf-8')
+        n_dropped = self.lines.n_dropped
+        n_new = self.lines.append_block(np.frombuffer(text, np.ubyte), formats=formats)
+        self._update_rows(n_new, self.lines.n_dropped - n_dropped)
+        return n_new
+
+    def clear(self):
+        self.lines.clear()
+        self.SetItemCount(0)
+        self.Refresh()
+
+    def get_line_index(self, row):
+        # Kept line shown in a row, 0 is the oldest line
+        return self.lines.n_lines - 1 - row if self.newest_first else row
+
+    def get_row_text(self, row):
+        line, _ = self.lines.get_line(self.get_line_index(row))
+        return line.tobytes().decode('utf-8', errors='replace')
+
+    def _update_rows(self, n_new, n_dropped):
+        # Keep the rows in view on the same lines unless the view follows the newest line
+        first_row = self.GetVisibleRowsBegin()
+        n_rows = self.lines.n_lines
+        follow = first_row == 0 if self.newest_first else self.GetVisibleRowsEnd() >= self.GetItemCount()
+        self.SetItemCount(n_rows)
+        if follow:
+            self.ScrollToRow(0 if self.newest_first else n_rows)
+        elif self.newest_first:
+            self.ScrollToRow(min(first_row + n_new, n_rows - 1))
+        else:
+            self.ScrollToRow(max(first_row - n_dropped, 0))
+        self.Refresh()
+
+    #
+    # wx.VListBox callbacks, called for the visible rows only
+    def OnMeasureItem(self, n):
+        return self.row_height
+
+    def OnDrawItem(self, dc, rect, n):
+        line, format_int = self.lines.get_line(self.get_line_index(n))
+        font, colour = self.formats.get(int(format_int), self.formats[0])
+        dc.SetFont(font)
+        dc.SetTextForeground(wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHTTEXT) if self.IsSelected(n) else colour)
+        dc.DrawText(line.tobytes().decode('utf-8', errors='replace'), rect.x + self.margin, rect.y + 1)
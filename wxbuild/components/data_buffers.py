@@ -0,0 +1,546 @@
+import os
+import numpy as np
+
+
+def ring_write(buffer_row, head, samples):
+    """
+    Write samples into a 1d circular buffer starting at head.
+
+    Only the newest samples that fit are kept. Returns the new head and the (start, stop) slices written.
+    """
+    n = buffer_row.size
+    if samples.size == 0:
+        return head, []
+    skip = max(0, samples.size - n)
+    head = (head + skip) % n
+    samples = samples[skip:]
+
+    first = min(samples.size, n - head)
+    buffer_row[head:head + first] = samples[:first]
+    buffer_row[:samples.size - first] = samples[first:]
+
+    spans = [(head, head + first)]
+    if samples.size > first:
+        spans.append((0, samples.size - first))
+    return (head + samples.size) % n, spans
+
+
+def nan_range(values):
+    """(min, max) of the non nan values, (inf, -inf) if there are none."""
+    if values.size == 0 or np.isnan(values).all():
+        return np.inf, -np.inf
+    return np.nanmin(values), np.nanmax(values)
+
+
+def nan_ranges(values):
+    """Row wise (min, max) of a 2d array ignoring nan, rows without any value give (inf, -inf)."""
+    mins = np.fmin.reduce(values, axis=1)
+    maxs = np.fmax.reduce(values, axis=1)
+    mins[np.isnan(mins)] = np.inf
+    maxs[np.isnan(maxs)] = -np.inf
+    return mins, maxs
+
+
+def sample_at_uniform(y, heads, x_start, x_step, x, interpolate=False):
+    """
+    Value of every row of a (n_lines, n) set of uniformly sampled circular lines at x => (x, y), one per line.
+
+    Logical sample k of line i is stored at (heads[i] + k) % n and lies at x_start[i] + k * x_step[i]. The sample is
+    found with the index formula, nearest sample or linear interpolation between its neighbours. Lines where x is
+    outside the samples give nan.
+    """
+    n = y.shape[1]
+    lines = np.arange(y.shape[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.where(x_step != 0, (x - x_start) / x_step, 0.0)
+    inside = (k > -0.5) & (k < n - 0.5)
+    k = np.clip(k, 0, n - 1)
+
+    if interpolate:
+        k0 = np.floor(k).astype(np.int64)
+        k1 = np.minimum(k0 + 1, n - 1)
+        weight = k - k0
+        y0, y1 = y[lines, (heads + k0) % n], y[lines, (heads + k1) % n]
+        x_out = np.full(lines.size, x, dtype=np.float64)
+        y_out = y0 + (y1 - y0) * weight
+    else:
+        k0 = np.rint(k).astype(np.int64)
+        x_out = x_start + k0 * x_step
+        y_out = y[lines, (heads + k0) % n].astype(np.float64)
+    x_out[~inside] = np.nan
+    y_out[~inside] = np.nan
+    return x_out, y_out
+
+
+def sample_at_sorted(x_row, y_row, x, interpolate=False):
+    """Value of one line with sorted x (trailing nan allowed) at x => (x, y), found by binary search."""
+    n_valid = np.searchsorted(x_row, np.inf, side='right')
+    if n_valid == 0 or x < x_row[0] or x > x_row[n_valid - 1]:
+        return np.nan, np.nan
+    if n_valid == 1:
+        return float(x_row[0]), float(y_row[0])
+    i = int(np.clip(np.searchsorted(x_row[:n_valid], x), 1, n_valid - 1))
+    x0, x1 = x_row[i - 1], x_row[i]
+    if interpolate:
+        weight = 0.0 if x1 == x0 else (x - x0) / (x1 - x0)
+        return x, float(y_row[i - 1] + (y_row[i] - y_row[i - 1]) * weight)
+    i = i - 1 if x - x0 <= x1 - x else i
+    return float(x_row[i]), float(y_row[i])
+
+
+def split_lines(text_data):
+    """Start offsets and sizes of the non empty lines of a block of bytes (np.ubyte array) split at line feeds."""
+    line_feeds = np.flatnonzero(text_data == 10)
+    starts = np.concatenate(([0], line_feeds + 1))
+    sizes = np.concatenate((line_feeds, [text_data.size])) - starts
+    not_empty = sizes > 0
+    return starts[not_empty], sizes[not_empty]
+
+
+def pyramid_level_sizes(n_samples, factor):
+    """Number of bins in each level of a min/max pyramid, level i has bins of factor**(i+1) samples."""
+    sizes = []
+    n = n_samples
+    while n > 1:
+        n = -(-n // factor)
+        sizes.append(n)
+    return sizes
+
+
+class MinMaxPyramid:
+    """
+    Min/max decimation pyramid of a 1d signal.
+
+    All levels live in one (n_bins_total, 2) array of (min, max) rows, level i holds bins of factor**(i+1) samples
+    and starts at level_offsets[i]. The pyramid only references the samples, so data can be a view into a larger
+    buffer or a np.memmap. Nan samples are ignored.
+    """
+    def __init__(self, data, factor=4, bins=None):
+        self.data = data
+        self.factor = factor
+        self.level_sizes = pyramid_level_sizes(data.size, factor)
+        self.level_offsets = np.concatenate(([0], np.cumsum(self.level_sizes))).astype(np.int64)
+        if bins is None:
+            self.bins = np.full((self.level_offsets[-1], 2), np.nan, dtype=np.float32)
+            self.update(0, data.size)
+        else:
+            self.bins = bins
+
+    def level(self, i):
+        return self.bins[self.level_offsets[i]:self.level_offsets[i + 1]]
+
+    def update(self, start, stop):
+        """Recompute the bins covering samples [start, stop) on every level, O(stop - start + n_levels)."""
+        source = self.data
+        for i in range(len(self.level_sizes)):
+            f = self.factor
+            start, stop = start // f, -(-stop // f)
+            segment = source[start * f:min(stop * f, source.shape[0])]
+            if segment.shape[0] == 0:
+                break
+            edges = np.arange(0, segment.shape[0], f)
+            level = self.level(i)
+            if i == 0:
+                level[start:stop, 0] = np.fmin.reduceat(segment, edges)
+                level[start:stop, 1] = np.fmax.reduceat(segment, edges)
+            else:
+                level[start:stop, 0] = np.fmin.reduceat(segment[:, 0], edges)
+                level[start:stop, 1] = np.fmax.reduceat(segment[:, 1], edges)
+            source = level
+
+    def get_range(self):
+        if len(self.level_sizes) == 0:
+            return nan_range(np.asarray(self.data))
+        top = self.level(len(self.level_sizes) - 1)
+        return top[0, 0], top[0, 1]
+
+    def envelope(self, start, stop, n_out):
+        """
+        Min/max envelope of samples [start, stop) in n_out bins.
+
+        Returns the sample positions (bin centers) and values, two vertices per bin (min then max). When there are
+        less than two samples per bin the raw samples are returned instead. Only samples inside [start, stop) are
+        used, the range can be one piece of a wrapped ring buffer whose neighbours are far away in time.
+        """
+        start, stop = max(0, int(start)), min(self.data.size, int(np.ceil(stop)))
+        n_out = max(1, int(n_out))
+        if stop - start <= 2 * n_out:
+            return np.arange(start, stop, dtype=np.float64), np.asarray(self.data[start:stop], dtype=np.float32)
+
+        # Finest level with bins not larger than one output bin, then regroup that level into n_out bins
+        samples_per_bin = (stop - start) / n_out
+        level_index, bin_size = -1, 1
+        while level_index + 1 < len(self.level_sizes) and bin_size * self.factor <= samples_per_bin:
+            level_index += 1
+            bin_size *= self.factor
+
+        # Whole bins inside the range from the level, the partial bins at its ends from the samples
+        first, last = -(-start // bin_size), stop // bin_size
+        if first >= last:
+            level_index, bin_size, first, last = -1, 1, start, stop
+        if level_index < 0:
+            mins = maxs = np.asarray(self.data[first:last], dtype=np.float32)
+        else:
+            level = self.level(level_index)
+            mins, maxs = level[first:last, 0], level[first:last, 1]
+        bounds = np.arange(first, last + 1, dtype=np.int64) * bin_size
+        if start < bounds[0]:
+            head = np.asarray(self.data[start:bounds[0]], dtype=np.float32)
+            mins, maxs = np.append(np.fmin.reduce(head), mins), np.append(np.fmax.reduce(head), maxs)
+            bounds = np.append(start, bounds)
+        if stop > bounds[-1]:
+            tail = np.asarray(self.data[bounds[-1]:stop], dtype=np.float32)
+            mins, maxs = np.append(mins, np.fmin.reduce(tail)), np.append(maxs, np.fmax.reduce(tail))
+            bounds = np.append(bounds, stop)
+
+        n_bins = mins.size
+        edges = np.unique(np.linspace(0, n_bins, n_out + 1).astype(np.int64)[:-1])
+        positions = np.empty(2 * edges.size, dtype=np.float64)
+        values = np.empty(2 * edges.size, dtype=np.float32)
+        positions[0::2] = positions[1::2] = (bounds[edges] + bounds[np.append(edges[1:], n_bins)] - 1) * 0.5
+        values[0::2] = np.fmin.reduceat(mins, edges)
+        values[1::2] = np.fmax.reduceat(maxs, edges)
+        return positions, values
+
+
+class LodLineSet:
+    """
+    Full resolution samples of a line set, with a min/max pyramid per line.
+
+    Lines are uniformly sampled, x = x_start + i * x_step. Lines can be appended to as circular buffers like the
+    lines of a LineSetVisual, the pyramids are then updated for the written samples only. Only an envelope of the
+    visible range is ever handed to the GPU, see envelope().
+    """
+    def __init__(self, n_lines, n_per_line, factor=4, capacity=None):
+        self.n_lines = n_lines  # Line slots in use, the arrays have room for capacity lines
+        self.n_per_line = n_per_line
+        self.factor = factor
+        self.free_lines = []
+        self.capacity = 0
+        self.y = self.heads = self.x_start = self.x_step = None
+        self.pyramids = []
+        self._allocate(max(n_lines, 1 if capacity is None else capacity))
+
+    def _allocate(self, capacity):
+        # Existing lines are copied, the pyramids keep their bins and are pointed at the new rows
+        old_capacity = self.capacity
+        arrays = {
+            'y': np.full((capacity, self.n_per_line), np.nan, dtype=np.float32),
+            'heads': np.zeros(capacity, dtype=np.int64),
+            'x_start': np.zeros(capacity, dtype=np.float64),
+            'x_step': np.ones(capacity, dtype=np.float64),
+        }
+        for name, array in arrays.items():
+            if old_capacity > 0:
+                array[:old_capacity] = getattr(self, name)
+            setattr(self, name, array)
+        self.pyramids = [
+            MinMaxPyramid(self.y[i], factor=self.factor, bins=pyramid.bins) for i, pyramid in enumerate(self.pyramids)
+        ] + [MinMaxPyramid(self.y[i], factor=self.factor) for i in range(old_capacity, capacity)]
+        self.capacity = capacity
+
+    def add_lines(self, n_new=1, x_start=None, x_step=None):
+        """Take n_new empty line slots => their indices, removed slots first, storage doubles when full."""
+        indices = sorted(self.free_lines)[:n_new]
+        self.free_lines = [i for i in self.free_lines if i not in indices]
+        n_rest = n_new - len(indices)
+        if self.n_lines + n_rest > self.capacity:
+            capacity = self.capacity
+            while capacity < self.n_lines + n_rest:
+                capacity *= 2
+            self._allocate(capacity)
+        indices.extend(range(self.n_lines, self.n_lines + n_rest))
+        self.n_lines += n_rest
+        for line_index in indices:
+            self.set_line(line_index, x_start=x_start, x_step=x_step)
+        return indices
+
+    def remove_line(self, line_index):
+        self.y[line_index] = np.nan
+        self.heads[line_index] = 0
+        self.pyramids[line_index].bins[:] = np.nan
+        if line_index not in self.free_lines:
+            self.free_lines.append(line_index)
+
+    def set_line(self, line_index, y_data=None, x_start=None, x_step=None):
+        if x_start is not None:
+            self.x_start[line_index] = x_start
+        if x_step is not None:
+            self.x_step[line_index] = x_step
+        if y_data is not None:
+            y_data = y_data[:self.n_per_line]
+            self.y[line_index, :y_data.size] = y_data
+            self.y[line_index, y_data.size:] = np.nan
+            self.heads[line_index] = 0
+            self.pyramids[line_index].update(0, self.n_per_line)
+
+    def append(self, line_index, samples):
+        head, spans = ring_write(self.y[line_index], int(self.heads[line_index]), samples)
+        self.heads[line_index] = head
+        for start, stop in spans:
+            self.pyramids[line_index].update(start, stop)
+        return spans
+
+    def get_line_extents(self):
+        """Per line extents => (n_lines, 4) array of (x min, x max, y min, y max), read from the pyramid tops."""
+        extents = np.empty((self.n_lines, 4), dtype=np.float64)
+        extents[:, 2:] = [pyramid.get_range() for pyramid in self.pyramids[:self.n_lines]]
+        x_start = self.x_start[:self.n_lines]
+        x_end = x_start + self.x_step[:self.n_lines] * (self.n_per_line - 1)
+        extents[:, 0], extents[:, 1] = np.minimum(x_start, x_end), np.maximum(x_start, x_end)
+        no_data = ~np.isfinite(extents[:, 2])
+        extents[no_data, 0::2], extents[no_data, 1::2] = np.inf, -np.inf
+        return extents
+
+    def sample_at(self, x, interpolate=False):
+        """Value of every line at x, see sample_at_uniform()."""
+        n = self.n_lines
+        return sample_at_uniform(
+            self.y[:n], self.heads[:n], self.x_start[:n], self.x_step[:n], x, interpolate=interpolate
+        )
+
+    def envelope(self, line_index, x0, x1, n_out):
+        """Envelope of the line between x0 and x1 with about 2 * n_out vertices => (x, y)."""
+        n = self.n_per_line
+        x_start, x_step = self.x_start[line_index], self.x_step[line_index]
+        k0 = int(np.clip(np.floor((x0 - x_start) / x_step), 0, n))
+        k1 = int(np.clip(np.ceil((x1 - x_start) / x_step) + 1, 0, n))
+        if k1 <= k0:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+
+        # Logical sample k is stored at (head + k) % n, the visible range is at most two physical pieces
+        head = int(self.heads[line_index])
+        p0, p1 = (head + k0) % n, (head + k1 - 1) % n + 1
+        pieces = [(p0, p1)] if p0 < p1 else [(p0, n), (0, p1)]
+
+        pyramid = self.pyramids[line_index]
+        positions, values = [], []
+        for start, stop in pieces:
+            piece_out = n_out * (stop - start) / (k1 - k0)
+            piece_positions, piece_values = pyramid.envelope(start, stop, piece_out)
+            positions.append((piece_positions - head) % n)
+            values.append(piece_values)
+        positions, values = np.concatenate(positions), np.concatenate(values)
+        return x_start + positions * x_step, values
+
+
+class RecordingFile:
+    """
+    Multi channel recording on disk, opened as a np.memmap so only the samples a view needs are paged in.
+
+    path is a .npy file, (n_samples,) or (n_samples, n_channels), or a raw binary file of interleaved dtype samples
+    after a header of offset bytes. Min/max pyramids with bins of factor**(i+1) samples are kept in a sidecar
+    summary file (summary_path, path + '.minmax.npy' by default) of shape (n_channels, total bins, 2), also memory
+    mapped. The summary is built once by build_summary(), meant to run in a worker thread, until then envelopes
+    are decimated by striding. Has the read side of the LodLineSet interface (n_lines, get_line_extents,
+    sample_at, envelope), so the panel can show it like a level-of-detail line set.
+    """
+    def __init__(self, path, n_channels=1, dtype=np.float32, sample_rate=1.0, t0=0.0, offset=0, channels_first=False,
+                 factor=64, summary_path=None):
+        self.path = path
+        if path.endswith('.npy'):
+            data = np.load(path, mmap_mode='r')
+            if data.ndim == 2 and channels_first:
+                data = data.T
+        else:
+            data = np.memmap(path, dtype=dtype, mode='r', offset=offset)
+            data = data[:data.size // n_channels * n_channels].reshape(-1, n_channels)
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        self.data = data  # (n_samples, n_channels) view of the file
+
+        self.n_per_line, self.n_lines = data.shape
+        self.factor = factor
+        self.heads = np.zeros(self.n_lines, dtype=np.int64)
+        self.x_start = np.full(self.n_lines, t0, dtype=np.float64)
+        self.x_step = np.full(self.n_lines, 1.0 / sample_rate, dtype=np.float64)
+
+        self.summary_path = path + '.minmax.npy' if summary_path is None else summary_path
+        self.summary_shape = (self.n_lines, int(np.sum(pyramid_level_sizes(self.n_per_line, factor))), 2)
+        self.summary_progress = 0.0
+        self.pyramids = []
+        # Rough y range until the summary exists, from a strided pick of at most ~64k samples per channel
+        step = max(1, self.n_per_line // 65536)
+        self.preview_ranges = nan_ranges(np.asarray(data[::step], dtype=np.float32).T)
+        self.load_summary()
+
+    @property
+    def summary_ready(self):
+        return len(self.pyramids) > 0
+
+    def load_summary(self):
+        """Use an existing summary file if it matches the recording and is not older => True if loaded."""
+        try:
+            if os.path.getmtime(self.summary_path) < os.path.getmtime(self.path):
+                return False
+            bins = np.load(self.summary_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+        if bins.shape != self.summary_shape:
+            return False
+        self.pyramids = [
+            MinMaxPyramid(self.data[:, i], factor=self.factor, bins=bins[i]) for i in range(self.n_lines)
+        ]
+        self.summary_progress = 1.0
+        return True
+
+    def build_summary(self, thread_instance=None, chunk_bins=65536):
+        """
+        Build the summary file, reading the recording once front to back in chunks of chunk_bins finest bins. Runs
+        as a MainFrame.init_thread_worker function, stops early if the worker is stopped. => True when done.
+        """
+        if self.summary_ready:
+            return True
+        level_sizes = pyramid_level_sizes(self.n_per_line, self.factor)
+        if len(level_sizes) == 0:
+            return False
+        offsets = np.concatenate(([0], np.cumsum(level_sizes))).astype(np.int64)
+        temp_path = self.summary_path + '.part.npy'
+        bins = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32, shape=self.summary_shape)
+
+        # Finest level from the samples, all channels of a chunk at once
+        chunk = chunk_bins * self.factor
+        for start in range(0, self.n_per_line, chunk):
+            if thread_instance is not None and not thread_instance.running:
+                del bins
+                os.remove(temp_path)
+                return False
+            block = np.asarray(self.data[start:start + chunk], dtype=np.float32)
+            edges = np.arange(0, block.shape[0], self.factor)
+            first = start // self.factor
+            bins[:, first:first + edges.size, 0] = np.fmin.reduceat(block, edges, axis=0).T
+            bins[:, first:first + edges.size, 1] = np.fmax.reduceat(block, edges, axis=0).T
+            self.summary_progress = 0.95 * min(1.0, (start + chunk) / self.n_per_line)
+
+        # Coarser levels from the level below, these are factor times smaller each
+        for i in range(1, len(level_sizes)):
+            below = bins[:, offsets[i - 1]:offsets[i]]
+            edges = np.arange(0, below.shape[1], self.factor)
+            bins[:, offsets[i]:offsets[i + 1], 0] = np.fmin.reduceat(below[:, :, 0], edges, axis=1)
+            bins[:, offsets[i]:offsets[i + 1], 1] = np.fmax.reduceat(below[:, :, 1], edges, axis=1)
+        bins.flush()
+        del bins
+        os.replace(temp_path, self.summary_path)
+        return self.load_summary()
+
+    def get_line_extents(self):
+        """Per channel extents => (n_lines, 4) array of (x min, x max, y min, y max), y from the summary if built."""
+        extents = np.empty((self.n_lines, 4), dtype=np.float64)
+        if self.summary_ready:
+            extents[:, 2:] = [pyramid.get_range() for pyramid in self.pyramids]
+        else:
+            extents[:, 2], extents[:, 3] = self.preview_ranges
+        x_end = self.x_start + self.x_step * (self.n_per_line - 1)
+        extents[:, 0], extents[:, 1] = np.minimum(self.x_start, x_end), np.maximum(self.x_start, x_end)
+        no_data = ~np.isfinite(extents[:, 2])
+        extents[no_data, 0::2], extents[no_data, 1::2] = np.inf, -np.inf
+        return extents
+
+    def sample_at(self, x, interpolate=False):
+        """Value of every channel at x, reads one or two samples per channel from the file."""
+        return sample_at_uniform(self.data.T, self.heads, self.x_start, self.x_step, x, interpolate=interpolate)
+
+    def envelope(self, line_index, x0, x1, n_out):
+        """Envelope of a channel between x0 and x1 with about 2 * n_out vertices => (x, y)."""
+        n = self.n_per_line
+        x_start, x_step = self.x_start[line_index], self.x_step[line_index]
+        k0 = int(np.clip(np.floor((x0 - x_start) / x_step), 0, n))
+        k1 = int(np.clip(np.ceil((x1 - x_start) / x_step) + 1, 0, n))
+        if k1 <= k0:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+
+        if self.summary_ready:
+            positions, values = self.pyramids[line_index].envelope(k0, k1, n_out)
+        else:
+            # No summary yet, every step-th sample only, peaks between them can be missed
+            step = max(1, (k1 - k0) // (2 * max(1, int(n_out))))
+            positions = np.arange(k0, k1, step, dtype=np.float64)
+            values = np.asarray(self.data[k0:k1:step, line_index], dtype=np.float32)
+        return x_start + positions * x_step, values
+
+
+class LogLineStore:
+    """
+    Text lines packed back to back in one byte array, for log views of millions of lines.
+
+    Kept line i (0 is the oldest) is data[offsets[first + i]:offsets[first + i + 1]] with format formats[first + i],
+    so the memory is the raw bytes plus 12 bytes per line. Past max_lines or max_bytes the oldest lines are dropped
+    by moving first, the arrays are compacted when they are full. After a compaction at least half of the capacity
+    is free, so appending costs amortized O(new bytes).
+    """
+    def __init__(self, max_lines=10_000_000, max_bytes=1 << 30, capacity_lines=1024, capacity_bytes=1 << 16):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.data = np.zeros(capacity_bytes, dtype=np.ubyte)
+        self.offsets = np.zeros(capacity_lines + 1, dtype=np.int64)
+        self.formats = np.zeros(capacity_lines, dtype=np.uint32)
+        self.first = 0  # Oldest kept line in the arrays
+        self.end = 0  # One past the newest line
+        self.n_dropped = 0  # Lines dropped since the start
+
+    @property
+    def n_lines(self):
+        return self.end - self.first
+
+    @property
+    def n_bytes(self):
+        return int(self.offsets[self.end] - self.offsets[self.first])
+
+    def append_block(self, text_data, formats=0):
+        """
+        Append the lines of a block of utf-8 bytes (np.ubyte array), split at line feeds => number of lines added.
+
+        Empty lines are dropped. formats is one format for all lines or one per non empty line.
+        """
+        _, sizes = split_lines(text_data)
+        n_new = sizes.size
+        if n_new == 0:
+            return 0
+        packed = text_data[text_data != 10]  # The non empty lines back to back
+
+        self._reserve(n_new, packed.size)
+        byte_end = self.offsets[self.end]
+        self.data[byte_end:byte_end + packed.size] = packed
+        self.offsets[self.end + 1:self.end + 1 + n_new] = byte_end + np.cumsum(sizes)
+        self.formats[self.end:self.end + n_new] = formats
+        self.end += n_new
+        self._drop_oldest()
+        return n_new
+
+    def _drop_oldest(self):
+        n_drop = max(0, self.n_lines - self.max_lines)
+        if self.max_bytes is not None and self.n_bytes > self.max_bytes:
+            kept = self.offsets[self.first:self.end + 1]
+            n_drop = max(n_drop, int(np.searchsorted(kept, kept[-1] - self.max_bytes)))
+        self.first += n_drop
+        self.n_dropped += n_drop
+
+    def _reserve(self, n_new_lines, n_new_bytes):
+        if self.end + n_new_lines <= self.formats.size and self.offsets[self.end] + n_new_bytes <= self.data.size:
+            return
+        # Move the kept lines to the front, then grow until at least half of the arrays is free
+        n_lines, n_bytes, byte_start = self.n_lines, self.n_bytes, self.offsets[self.first]
+        line_capacity, byte_capacity = self.formats.size, self.data.size
+        while 2 * (n_lines + n_new_lines) > line_capacity:
+            line_capacity *= 2
+        while 2 * (n_bytes + n_new_bytes) > byte_capacity:
+            byte_capacity *= 2
+
+        data = self.data if byte_capacity == self.data.size else np.zeros(byte_capacity, dtype=np.ubyte)
+        data[:n_bytes] = self.data[byte_start:byte_start + n_bytes]
+        offsets = self.offsets if line_capacity == self.formats.size else np.zeros(line_capacity + 1, dtype=np.int64)
+        offsets[:n_lines + 1] = self.offsets[self.first:self.end + 1] - byte_start
+        formats = self.formats if line_capacity == self.formats.size else np.zeros(line_capacity, dtype=np.uint32)
+        formats[:n_lines] = self.formats[self.first:self.end]
+        self.data, self.offsets, self.formats = data, offsets, formats
+        self.first, self.end = 0, n_lines
+
+    def get_line(self, line_index):
+        """Bytes and format of kept line line_index, 0 is the oldest."""
+        i = self.first + line_index
+        return self.data[self.offsets[i]:self.offsets[i + 1]], self.formats[i]
+
+    def clear(self):
+        self.n_dropped += self.n_lines
+        self.first = self.end = 0
+        self.offsets[0] = 0
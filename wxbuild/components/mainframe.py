@@ -211,7 +211,8 @@ class MainFrame(wx.Frame):
 
     #
     # Thread workers # Thread workers # Thread workers # Thread workers # Thread workers # Thread workers
-    def init_thread_worker(self, run_func, worker_id=-1, callback_func=None, run_once=True, kwargs=None):
+    def init_thread_worker(self, run_func, worker_id=-1, callback_func=None, run_once=True, kwargs=None,
+                           sleep_time=0.2):
         print("\nAppending worker:")
         worker_table_index = self.get_thread_worker_table_index_by_id(worker_id)
 
@@ -227,7 +228,8 @@ class MainFrame(wx.Frame):
             else:
                 call_event = False
             thread_worker = WorkerThread(
-                func=run_func, parent=self, wx_id=worker_id, run_once=run_once, kwargs=kwargs, call_event=call_event
+                func=run_func, parent=self, wx_id=worker_id, run_once=run_once, sleep_time=sleep_time, kwargs=kwargs,
+                call_event=call_event,
             )
 
             print(" - thread worker: ", thread_worker, worker_id)
@@ -4,6 +4,9 @@ import wx.richtext
 
 import numpy as np
 
+from wxbuild.components.data_buffers import split_lines
+from wxbuild.components.custom_widgets.virtuallog import VirtualLogCtrl
+
 
 @dataclass
 class WxPanel:
@@ -16,6 +19,8 @@ class WxPanel:
     background_color: tuple = ()
     shape: tuple = (1, 1)
     size: tuple = (10, 10)
+    virtual_log: bool = False  # Owner drawn VirtualLogCtrl widgets instead of RichTextCtrl, for very long logs
+    max_log_lines: int = 10_000_000
 
 
 class RichtextPanel(wx.Panel):
@@ -47,6 +52,7 @@ class RichtextPanel(wx.Panel):
         self.static_pre_text = []
         self.static_post_text = []
         self.dynamic_text = []
+        self.buffer_heads = []  # Slot of the next line in the dynamic_text ring, the oldest line, per widget
 
         self.rich_text_widgets = []
         self.write_pointers = []
@@ -116,21 +122,29 @@ class RichtextPanel(wx.Panel):
 
         for i in range(self.n_rows):
             for j in range(self.n_cols):
-                richtext_widget = wx.richtext.RichTextCtrl(
-                    self, wx.ID_ANY, value=value, style=wx.TE_MULTILINE | wx.TE_READONLY, size=self.dataclass.size
-                )
+                if self.dataclass.virtual_log:
+                    richtext_widget = VirtualLogCtrl(
+                        self, wx.ID_ANY, size=self.dataclass.size, max_lines=self.dataclass.max_log_lines,
+                        font=self.text_fonts[0],
+                    )
+                else:
+                    richtext_widget = wx.richtext.RichTextCtrl(
+                        self, wx.ID_ANY, value=value, style=wx.TE_MULTILINE | wx.TE_READONLY, size=self.dataclass.size
+                    )
                 self.sizer.Add(richtext_widget, 1, wx.ALL | wx.EXPAND, 5)
 
                 self.rich_text_widgets.append(richtext_widget)
                 self.insertion_pointers.append(0)
                 self.write_pointers.append(0)
                 self.read_pointers.append(0)
+                # Ring buffer of lines, a new line takes the slot at buffer_heads and the oldest line drops out
                 self.dynamic_text.append([
                     np.zeros(self.text_length_shape[0], dtype=np.ubyte),     # size
                     np.zeros(self.text_length_shape[0], dtype=bool),         # written
                     np.zeros(self.text_length_shape[0], dtype=np.uint32),    # format
                     np.zeros(shape=self.text_length_shape, dtype=np.ubyte),  # Ascii decoded text
                 ])
+                self.buffer_heads.append(0)
                 self.static_pre_text.append("")
                 self.static_post_text.append("")
 
@@ -141,6 +155,9 @@ class RichtextPanel(wx.Panel):
 
     def clear_displayed_text(self, widget_index=0):
         # print(" clearing displayed text:: ")
+        if self.dataclass.virtual_log:
+            self.rich_text_widgets[widget_index].clear()
+            return
         self.Freeze()
         widget = self.rich_text_widgets[widget_index]
         widget.Remove(self.insertion_pointers[widget_index], widget.GetLastPosition())
@@ -153,6 +170,12 @@ class RichtextPanel(wx.Panel):
         self.dynamic_text[widget_index][0][:] = 0
 
     def add_to_text(self, text, widget_index=0):
+        if self.dataclass.virtual_log:
+            # The virtual log keeps every line itself and draws only the visible rows
+            text_data = np.frombuffer(text.encode('utf-8'), np.ubyte)
+            formats = self._filter_text_lines_with_masks(text_data, *split_lines(text_data))
+            self.rich_text_widgets[widget_index].add_text(text_data, formats=formats)
+            return
         self._add_text_to_buffer(text, widget_index)
         self._write_text_to_widget_from_buffer(widget_index)
 
@@ -166,56 +189,53 @@ class RichtextPanel(wx.Panel):
         print(" set_static_post_text:: ")
 
     def update_widget(self):
+        if self.dataclass.virtual_log:
+            return
         for i in range(len(self.dynamic_text)):
             self._write_text_to_widget_from_buffer(widget_index=i)
 
     #
     def _add_text_to_buffer(self, text: str, widget_index=0):
-        max_line_width = self.text_length_shape[1]
-        text_data = np.frombuffer(text.encode('utf-8'), np.byte)
-        line_feed_args = np.squeeze(np.argwhere(text_data == 10))
-        if line_feed_args.ndim == 0:
-            line_feed_args = np.array((line_feed_args,), dtype=np.ubyte)
-
-        lf_pos = 0
-        for i, lf_pos in enumerate(line_feed_args):
-            if i == 0:
-                if lf_pos > 0:
-                    line_text = text_data[: lf_pos]
-                    self._add_single_text_line_to_buffer(line_text[:max_line_width], widget_index)
-                    #
-                    # print(" found a line: ", i, ":", line_text.size, lf_pos, "  (i==0, lf_pos > 0)")
-            else:
-                line_text = text_data[line_feed_args[i-1] + 1: lf_pos]
-                self._add_single_text_line_to_buffer(line_text[:max_line_width], widget_index)
-                # print(" found a line: ", i, ":", line_text.size, lf_pos, "  (i>0")
-        if lf_pos < text_data.size:
-            line_text = text_data[lf_pos + 1:]
-            self._add_single_text_line_to_buffer(line_text[:max_line_width], widget_index)
-            # print(" found a line: ", i + 1, ":", line_text.size, lf_pos, "  (lf_pos < text_data.size)")
-
-    def _add_single_text_line_to_buffer(self, text_line: np.array, widget_index=0) -> None:
-        format_int = self._filter_line_text_with_masks(text_line)
-
-        text_size_map =  self.dynamic_text[widget_index][0]
-        bool_text_drawn_map = self.dynamic_text[widget_index][1]
-        text_format_map = self.dynamic_text[widget_index][2]
-        text_buffer = self.dynamic_text[widget_index][3]  # shape=self.text_length_shape
-
-        text_size_map[0] = text_line.size
-        bool_text_drawn_map[0] = False
-        text_format_map[0] = format_int
-        text_buffer[0, :text_line.size] = text_line[:]
-        self.dynamic_text[widget_index][0] = np.roll(text_size_map, -1)
-        self.dynamic_text[widget_index][1] = np.roll(bool_text_drawn_map, -1)
-        self.dynamic_text[widget_index][2] = np.roll(text_format_map, -1)
-        self.dynamic_text[widget_index][3] = np.roll(text_buffer, -1, axis=0)
+        """
+        Split a block of text into lines and write them all into the ring in one pass.
+
+        Line start and stop offsets come from the line feed positions, the characters of all lines are scattered
+        into their ring slots with one fancy indexed assignment. Empty lines are dropped, they were never drawn.
+        Only the newest lines that fit in the ring are kept.
+        """
+        text_size_map, bool_text_drawn_map, text_format_map, text_buffer = self.dynamic_text[widget_index]
+        n_slots, max_line_width = self.text_length_shape
+        text_data = np.frombuffer(text.encode('utf-8'), np.ubyte)
+
+        starts, sizes = split_lines(text_data)
+        starts, sizes = starts[-n_slots:], np.minimum(sizes[-n_slots:], max_line_width)
+        if starts.size == 0:
+            return
+
+        # Character k of line i goes from text_data[starts[i] + k] to text_buffer[slots[i], k]
+        slots = (self.buffer_heads[widget_index] + np.arange(starts.size)) % n_slots
+        line_of_char = np.repeat(np.arange(starts.size), sizes)
+        char_in_line = np.arange(line_of_char.size) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        text_buffer[slots[line_of_char], char_in_line] = text_data[starts[line_of_char] + char_in_line]
+
+        text_size_map[slots] = sizes
+        bool_text_drawn_map[slots] = False
+        text_format_map[slots] = self._filter_text_lines_with_masks(text_data, starts, sizes)
+        self.buffer_heads[widget_index] = int(slots[-1] + 1) % n_slots
+
+    def _get_buffer_order(self, widget_index=0):
+        # Ring slots from the newest line to the oldest
+        n_slots = self.text_length_shape[0]
+        return (self.buffer_heads[widget_index] - 1 - np.arange(n_slots)) % n_slots
 
     def _write_text_to_widget_from_buffer(self, widget_index=0):
-        text_size_map =  self.dynamic_text[widget_index][0][::-1]
-        bool_is_text_drawn_map = self.dynamic_text[widget_index][1][::-1]
-        text_format_map = self.dynamic_text[widget_index][2][::-1]
-        text_buffer = self.dynamic_text[widget_index][3][::-1, :]
+        # Lines are read newest first through the ring order, the drawn flags are set in their own slots
+        order = self._get_buffer_order(widget_index)
+        text_size_map = self.dynamic_text[widget_index][0][order]
+        bool_drawn_slots = self.dynamic_text[widget_index][1]
+        bool_is_text_drawn_map = bool_drawn_slots[order]
+        text_format_map = self.dynamic_text[widget_index][2][order]
+        text_buffer = self.dynamic_text[widget_index][3]
         n_lines_to_draw_max = self.max_line_writes_per_frame
 
         widget = self.rich_text_widgets[widget_index]
@@ -241,10 +261,10 @@ class RichtextPanel(wx.Panel):
                     elif jumped_over_text:
                         self._set_insertion_text_format(widget, text_format_int)
 
-                    text = text_buffer[i, :text_size_map[i]].tobytes().decode('utf-8') + "\n"
+                    text = text_buffer[order[i], :text_size_map[i]].tobytes().decode('utf-8') + "\n"
                     widget.WriteText(text=text)
                     lines_drawn += 1
-                    bool_is_text_drawn_map[i] = True
+                    bool_drawn_slots[order[i]] = True
                     jumped_over_text = False
                 else:
                     write_pointer += text_size_map[i] + 1
@@ -254,7 +274,6 @@ class RichtextPanel(wx.Panel):
             if i == text_size_map.size:
                 break
 
-        self.dynamic_text[widget_index][1][:] = bool_is_text_drawn_map[::-1]
         if widget.GetLastPosition() > self.max_characters:
             widget.Remove(self.max_characters, widget.GetLastPosition())
 
@@ -268,5 +287,6 @@ class RichtextPanel(wx.Panel):
             widget.BeginFont(self.text_fonts[0])
             widget.BeginTextColour(wx.BLACK)
 
-    def _filter_line_text_with_masks(self, text_line: np.array) -> int:
-        return 0
\ No newline at end of file
+    def _filter_text_lines_with_masks(self, text_data: np.array, starts: np.array, sizes: np.array) -> np.array:
+        # Format of every line of a block, lines are text_data[starts[i]:starts[i] + sizes[i]]
+        return np.zeros(starts.size, dtype=np.uint32)
\ No newline at end of file
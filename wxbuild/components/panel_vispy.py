@@ -1,9 +1,14 @@
 from dataclasses import dataclass
+import time
 import wx
 from vispy import scene
+from vispy.visuals.axis import Ticker
 import numpy as np
 
 from wxbuild.components.styles_colors import ColorsCyclic
+from wxbuild.components.vispy_visuals import LineSet, Waterfall, MarkerSet
+from wxbuild.components.data_buffers import LodLineSet, RecordingFile
+from wxbuild.components.signal_processing import PersistenceHistogram, FrameAcquisition
 import wxbuild.components.custom_widgets.gradientbutton as wxgb
 
 @dataclass
@@ -79,6 +84,47 @@ class VispyCanvas(scene.SceneCanvas):
         view.camera.set_range(x_lim, y_lim, margin=0.0)
 
 
+def significant_digits(value, resolution, min_digits=4):
+    """Significant digits of value that tell apart values resolution apart, '%.{digits}g' formatting."""
+    value, resolution = abs(value), abs(resolution)
+    if not (np.isfinite(value) and np.isfinite(resolution)) or value == 0 or resolution == 0:
+        return min_digits
+    return int(np.clip(np.floor(np.log10(value)) - np.floor(np.log10(resolution)) + 1, min_digits, 17))
+
+
+class OriginTicker(Ticker):
+    """
+    Ticker of an OriginAxisWidget. Ticks are placed in the axis' offset domain, labels show origin + offset with
+    the digits the tick step needs, vispy's '%g' keeps 6 and labels far from zero would all read the same.
+    """
+    def __init__(self, axis, widget):
+        Ticker.__init__(self, axis)
+        self.widget = widget
+
+    def _get_tick_frac_labels(self):
+        major_frac, minor_frac, labels = Ticker._get_tick_frac_labels(self)
+        if len(major_frac) == 0:
+            return major_frac, minor_frac, labels
+        d0, d1 = self.axis.domain
+        lo, scale = min(d0, d1), abs(d1 - d0)
+        values = lo + np.asarray(major_frac, dtype=np.float64) * scale
+        step = np.min(np.abs(np.diff(values))) if values.size > 1 else scale
+        if step > 0:
+            values = np.round(values / step) * step
+        values = values + self.widget.origin
+        digits = significant_digits(np.max(np.abs(values)), step, min_digits=1)
+        labels = [f'{value:.{digits}g}' for value in values]
+        return major_frac, minor_frac, labels
+
+
+class OriginAxisWidget(scene.AxisWidget):
+    """AxisWidget of a view whose scene coordinates are offsets from a float64 origin, labels show origin + x."""
+    def __init__(self, *args, **kwargs):
+        self.origin = 0.0
+        scene.AxisWidget.__init__(self, *args, **kwargs)
+        self.axis.ticker = OriginTicker(self.axis, self)
+
+
 class VispyPanel(wx.Panel):
     def __init__(self, parent, main_frame, **kwargs):
         self.dataclass = WxPanel
@@ -96,38 +142,65 @@ class VispyPanel(wx.Panel):
 
         self.N = 64
         self.data_info = []
-        self.data_sets = {  # One set per viewbox
-            0 : [
-                np.empty(shape=(1, 0, 2), dtype=np.float32),  # vertex coordinates
-                np.empty(shape=(1, 0, 4), dtype=np.float32),  # vertex colors
-                np.empty(shape=(1, 0, 2), dtype=np.float32),  # if a image
-            ],
-        }
         self.selected_view_index = 0
 
         self.play = True
-        self.play_color = (1, 0, 0, 1)
+        self.play_color = (1, 1, 1, 1)  # View border colors
         self.pause_color = (1, 0, 0, 1)
         self.show_crosshair = False
 
         self.initialized = 0
         self.resized = False
+        #
+        # Data updates only flag the panel dirty, the render timer draws at most once per frame and max_fps
+        self.max_fps = 60
+        self.draw_pending = False
+        self.last_draw_time = 0
+        self.render_timer = wx.Timer(self)
         self.canvas = VispyCanvas(app='wx', parent=self, keys='interactive', bgcolor='black', size=kwargs['size'])
         grid = self.canvas.central_widget.add_grid(spacing=0)
 
         self.mouse_over_plot = 0
-        self.mouse_x = 0
+        self.mouse_x = 0  # Scene coordinates of the view under the mouse, data x is mouse_x + x_origin[view]
         self.mouse_y = 0
         self.mousemove_callback = None
         self.mouseclick_callback = None
+        # Data cursor, the readout is refreshed by the render timer at most once per frame
+        self.cursor_enabled = True
+        self.cursor_interpolate = False
+        self.cursor_pending = False
+        self.cursor_texts = []
         #
         self.view_boxes = []
         self.lines = {}
-        self.line_crosshairs = []
+        self.lod_line_sets = {}  # Full resolution data of level-of-detail line sets, per view
+        self.lod_max_width = 4096  # Largest view width in pixels served by a level-of-detail display buffer
+        self.recordings = {}  # Memory mapped recordings shown like level-of-detail line sets, per view
+        self.images = {}  # Waterfall images, per view
+        self.persistence = {}  # Persistence histograms shown in the view's image, per view
+        self.acquisitions = {}  # (FrameAcquisition, lower envelope line indices) of views fed by update_frame()
+        # Scrollback, the last samples of every line kept with min/max pyramids and shown instead of the live data
+        # while paused (play is False). Samples appended while paused are counted to keep the history fixed in x
+        self.history_sets = {}
+        self.history_displays = {}
+        self.history_paused_samples = {}
+        self.stacked_spacing = {}  # Distance between the traces of views in stacked mode, per view
+        self.marker_sets = {}  # All vertical and horizontal markers of a view in one visual, per view
+        self.marker_labels = {}  # One text visual with all marker labels, per view
+        # Overlays live in view box pixel coordinates and are created once, moving them only changes a transform
+        self.line_crosshairs = []  # (vertical, horizontal) line per view
+        self.measure_cursors = []  # Two vertical lines per view, at measure_cursor_x
+        self.measure_cursor_x = []  # [x a, x b] per view in data coordinates, nan when not placed
+        self.measure_texts = []
+        self.dragged_cursor = None  # (view index, cursor index) while a measurement cursor is dragged
         self.ax_lines = []
-        self.vertical_lines = []
-        self.horizontal_lines = []
+        self.vertical_lines = []  # (view index, marker id) of the lines from add_vertical_line
+        self.horizontal_lines = []  # (view index, marker id) of the lines from add_horizontal_line
         #
+        # Float64 x origin per view. Everything in a view's scene (vertex data, camera, markers, images, x_data_min
+        # and x_data_max) is x - origin in float32, data given to and returned by the panel is absolute
+        self.x_origin = []
+        self.origin_rebase_pending = set()  # Views panned far from their origin, re-based by the render timer
         self.x_data_min = []
         self.x_data_max = []
         self.y_data_min = []
@@ -141,7 +214,7 @@ class VispyPanel(wx.Panel):
             for col in range(self.plot_cols):
                 view_box = grid.add_view(row=row, col=col, camera='panzoom', border_color='w')
 
-                x_axis = scene.AxisWidget(orientation='top')
+                x_axis = OriginAxisWidget(orientation='top')
                 x_axis.stretch = (1, 0.1)
                 grid.add_widget(x_axis, row=row, col=col)
                 x_axis.link_view(view_box)
@@ -154,7 +227,12 @@ class VispyPanel(wx.Panel):
                 self.y_axis.append(y_axis)
 
                 self.gridlines.append(scene.visuals.GridLines(color='w', parent=view_box.scene))
+                self.cursor_texts.append(scene.visuals.Text(
+                    '', color='w', font_size=8, anchor_x='left', anchor_y='top', pos=(8, 8), parent=view_box,
+                ))
+                self._add_overlays(view_box)
                 self.view_boxes.append(view_box)
+                self.x_origin.append(0.0)
                 self.x_data_min.append(99999999)
                 self.x_data_max.append(-99999999)
                 self.y_data_min.append(99999999)
@@ -164,27 +242,82 @@ class VispyPanel(wx.Panel):
         self.canvas.show()
         self.Bind(wx.EVT_SIZE, self.on_repaint)
         self.Bind(wx.EVT_IDLE, self.on_idle)
+        self.Bind(wx.EVT_TIMER, self.on_render_timer, self.render_timer)
+        self.render_timer.Start(int(1000 / self.max_fps))
         self.canvas.events.key_press.connect(self.key_pressed)
         self.canvas.events.mouse_move.connect(self.mouse_moved)
         self.canvas.events.mouse_press.connect(self.mouse_pressed)
+        self.canvas.events.mouse_release.connect(self.mouse_released)
+        for i, view_box in enumerate(self.view_boxes):
+            view_box.scene.transform.changed.connect(lambda event, i=i: self._place_measure_cursors(i))
+            view_box.scene.transform.changed.connect(lambda event, i=i: self._check_camera_origin(i))
 
     def post_init(self):
         pass
 
+    def _add_overlays(self, view_box):
+        vertical = np.array([[0, 0], [0, 1]], dtype=np.float32)
+        horizontal = np.array([[0, 0], [1, 0]], dtype=np.float32)
+        crosshair = []
+        for pos in (vertical, horizontal):
+            line = scene.visuals.Line(pos=pos, color=(1, 1, 1, 0.5), parent=view_box)
+            line.transform = scene.transforms.STTransform()
+            line.visible = False
+            crosshair.append(line)
+        self.line_crosshairs.append(crosshair)
+
+        cursors = []
+        for color in ((1, 1, 0, 0.8), (0, 1, 1, 0.8)):
+            line = scene.visuals.Line(pos=vertical, color=color, parent=view_box)
+            line.transform = scene.transforms.STTransform()
+            line.visible = False
+            cursors.append(line)
+        self.measure_cursors.append(cursors)
+        self.measure_cursor_x.append([np.nan, np.nan])
+
+        text = scene.visuals.Text('', color='w', font_size=8, anchor_x='left', anchor_y='bottom', parent=view_box)
+        text.transform = scene.transforms.STTransform()
+        self.measure_texts.append(text)
+
     def mouse_pressed(self, event):
+        # Grab a measurement cursor within a few pixels of the mouse, the camera holds still while it is dragged
+        if event.button == 1 and self.mouse_over_plot >= 0:
+            view_box = self.view_boxes[self.mouse_over_plot]
+            mouse_x = event.pos[0] - view_box.pos[0]
+            for k, x in enumerate(self.measure_cursor_x[self.mouse_over_plot]):
+                if np.isfinite(x) and abs(self._data_to_pixel_x(self.mouse_over_plot, x) - mouse_x) < 6:
+                    self.dragged_cursor = (self.mouse_over_plot, k)
+                    view_box.camera.interactive = False
+                    break
         if hasattr(self.mouseclick_callback, '__call__'):
             self.mouseclick_callback(event)
 
+    def mouse_released(self, event):
+        if self.dragged_cursor is not None:
+            self.view_boxes[self.dragged_cursor[0]].camera.interactive = True
+            self.dragged_cursor = None
+
     def mouse_moved(self, event):
         self.get_mouse_view_box_coordinates(event)
+        if self.cursor_enabled:
+            self.cursor_pending = True
+        if self.show_crosshair:
+            self._place_crosshair(event)
+        if self.dragged_cursor is not None and self.dragged_cursor[0] == self.mouse_over_plot:
+            self.set_measure_cursor(*self.dragged_cursor, x=self.mouse_x + self.x_origin[self.mouse_over_plot])
         if hasattr(self.mousemove_callback, '__call__'):
             self.mousemove_callback(event)
 
     def key_pressed(self, event):
         if hasattr(event.key, 'name'):
             key_char = event.key.name
-            if key_char in 'ASHZXCQWE':
-                if key_char == 'H':
+            if key_char == 'Space':
+                self.toggle_play()
+            elif key_char in 'ASHZXCQWE':
+                if key_char in 'AS' and self.mouse_over_plot >= 0:
+                    x = self.mouse_x + self.x_origin[self.mouse_over_plot]
+                    self.set_measure_cursor(self.mouse_over_plot, 'AS'.index(key_char), x=x)
+                elif key_char == 'H':
                     self.reset_axis_limits(ax_index=self.mouse_over_plot)
                 elif key_char == 'Z':
                     self.reset_axis_limits(ax_index=self.mouse_over_plot, direction=-1)
@@ -217,12 +350,13 @@ class VispyPanel(wx.Panel):
         plot_index = self.mouse_over_plot
         mouse_x, mouse_y = event.pos
 
+        if plot_index < 0:
+            return
         view_box = self.view_boxes[plot_index]
 
         rect_x, rect_y = [getattr(view_box.rect, attrib) for attrib in ['right', 'top']]
 
-        row, col = plot_index // self.plot_rows, plot_index % self.plot_cols
-        mouse_x_vb, mouse_y_vb = mouse_x - col * rect_x, mouse_y - row*rect_y
+        mouse_x_vb, mouse_y_vb = mouse_x - view_box.pos[0], mouse_y - view_box.pos[1]
 
         x_camera_rect_pos, y_camera_rect_pos = view_box.camera.rect.pos
         x_camera_rect_size, y_camera_rect_size = view_box.camera.rect.size
@@ -307,6 +441,39 @@ class VispyPanel(wx.Panel):
             self.adapt_canvas_size()
             event.Skip()
 
+    def on_render_timer(self, event):
+        # Re-base outside of the camera's transform change event, moving the camera from its handler is a loop
+        while self.origin_rebase_pending:
+            self._rebase_camera_origin(self.origin_rebase_pending.pop())
+        if not self.draw_pending and not self.cursor_pending:
+            return
+        # The timer period already paces the frames, this only skips ticks that arrive in a burst (timer jitter)
+        if time.perf_counter() - self.last_draw_time < 0.8 / self.max_fps:
+            return
+        # Nobody sees the frame, keep it pending until the panel is shown again
+        if not self.IsShownOnScreen() or wx.GetTopLevelParent(self).IsIconized():
+            return
+
+        if self.cursor_pending:
+            self.cursor_pending = False
+            self.update_cursor_readout()
+        # Data may have changed under placed measurement cursors
+        for i, cursor_x in enumerate(self.measure_cursor_x):
+            if np.isfinite(cursor_x).all():
+                self._update_measurement(i)
+        self.draw_pending = False
+        self._update_persistence_images()
+        self.last_draw_time = time.perf_counter()
+        self.canvas.update()
+
+    def request_draw(self):
+        """Flag the canvas for a redraw, drawn by the render timer at the next frame."""
+        self.draw_pending = True
+
+    def set_max_fps(self, max_fps):
+        self.max_fps = max_fps
+        self.render_timer.Start(int(1000 / self.max_fps))
+
     def toggle_axis(self):
         ax_elements = self.x_axis + self.y_axis + self.gridlines
         for axis in ax_elements:
@@ -316,6 +483,68 @@ class VispyPanel(wx.Panel):
                 axis.visible = True
         print(" hiding axes::: ", )
 
+    def toggle_crosshair(self):
+        self.show_crosshair = not self.show_crosshair
+        for crosshair in self.line_crosshairs:
+            for line in crosshair:
+                line.visible = False
+        self.request_draw()
+
+    def _place_crosshair(self, event):
+        for i, (vertical, horizontal) in enumerate(self.line_crosshairs):
+            vertical.visible = horizontal.visible = i == self.mouse_over_plot
+        if self.mouse_over_plot < 0:
+            self.request_draw()
+            return
+        view_box = self.view_boxes[self.mouse_over_plot]
+        vertical, horizontal = self.line_crosshairs[self.mouse_over_plot]
+        vertical.transform.scale = (1, view_box.height)
+        vertical.transform.translate = (event.pos[0] - view_box.pos[0], 0)
+        horizontal.transform.scale = (view_box.width, 1)
+        horizontal.transform.translate = (0, event.pos[1] - view_box.pos[1])
+        self.request_draw()
+
+    def _data_to_pixel_x(self, view_index, x):
+        view_box = self.view_boxes[view_index]
+        return view_box.scene.node_transform(view_box).map([[x - self.x_origin[view_index], 0]])[0, 0]
+
+    def set_measure_cursor(self, view_index, cursor_index, x=np.nan):
+        """Place measurement cursor 0 (a) or 1 (b) of a view at data x, nan removes it."""
+        self.measure_cursor_x[view_index][cursor_index] = x
+        self._place_measure_cursors(view_index)
+        self._update_measurement(view_index)
+        self.request_draw()
+
+    def clear_measure_cursors(self, view_index):
+        self.set_measure_cursor(view_index, 0)
+        self.set_measure_cursor(view_index, 1)
+
+    def _place_measure_cursors(self, view_index):
+        # Called on every camera change, only the transforms of the two lines are touched
+        view_box = self.view_boxes[view_index]
+        for line, x in zip(self.measure_cursors[view_index], self.measure_cursor_x[view_index]):
+            line.visible = bool(np.isfinite(x))
+            if line.visible:
+                line.transform.scale = (1, view_box.height)
+                line.transform.translate = (self._data_to_pixel_x(view_index, x), 0)
+        self.measure_texts[view_index].transform.translate = (8, view_box.height - 8)
+
+    def _update_measurement(self, view_index):
+        # Values at the cursors come from the cached line data through the index formula or a binary search
+        x_a, x_b = self.measure_cursor_x[view_index]
+        text = self.measure_texts[view_index]
+        if not (np.isfinite(x_a) and np.isfinite(x_b)):
+            readout = ''
+        else:
+            _, y_a = self.get_cursor_values(view_index, x_a, interpolate=True)
+            _, y_b = self.get_cursor_values(view_index, x_b, interpolate=True)
+            dx = x_b - x_a
+            readout = f'dx = {dx:.6g}' + (f'   1/dx = {1 / dx:.6g}' if dx != 0 else '')
+            for i in np.flatnonzero(np.isfinite(y_a) & np.isfinite(y_b)):
+                readout += f'\nline {i}: dy = {y_b[i] - y_a[i]:.4g}'
+        if text.text != readout:
+            text.text = readout
+
     def toggle_viewbox(self):
         if self.view_boxes[0].visible:
             self.view_boxes[0].visible = False
@@ -324,35 +553,272 @@ class VispyPanel(wx.Panel):
 
     #
     # Create plot widgets
-    def add_line_set(self, n_lines, n_per_line, view_index=None):
+    #
+    # X origin
+    def set_x_origin(self, view_index, origin):
+        """
+        Move the float64 origin of a view's x axis, the scene keeps float32 offsets from it. Everything in the scene
+        is moved by the difference once, the camera included, so nothing changes on screen.
+        """
+        shift = self.x_origin[view_index] - origin
+        if shift == 0:
+            return
+        self.x_origin[view_index] = origin
+        self.x_axis[view_index].origin = origin
+
+        if view_index in self.lines and view_index not in self.lod_line_sets and view_index not in self.recordings:
+            self.lines[view_index].shift_x(shift)
+        if view_index in self.images:
+            image = self.images[view_index]
+            image.set_ranges(x_range=(image.x_range[0] + shift, image.x_range[1] + shift))
+        if view_index in self.marker_sets:
+            self.marker_sets[view_index].shift(shift, orientation='vertical')
+        self.x_data_min[view_index] += shift
+        self.x_data_max[view_index] += shift
+
+        # Level-of-detail displays are rebuilt from their float64 data on the camera change
+        camera = self.view_boxes[view_index].camera
+        rect = camera.rect
+        camera.rect = (rect.left + shift, rect.bottom, rect.width, rect.height)
+        self.request_draw()
+
+    def _fit_x_origin(self, view_index, x_first, x_step):
+        # Float32 keeps 24 bits, data further than 2**16 steps from the origin would lose sub-sample resolution
+        if not (np.isfinite(x_first) and np.isfinite(x_step)) or x_step == 0:
+            return
+        if abs(x_first - self.x_origin[view_index]) > 2**16 * abs(x_step):
+            self.set_x_origin(view_index, float(x_first))
+
+    def _fit_x_origin_to_rows(self, view_index, x):
+        # Fit the origin to absolute x (one row or one row per line) => x in scene coordinates, None stays None
+        if x is None:
+            return None
+        x = np.asarray(x, dtype=np.float64)
+        row = np.atleast_2d(x)[0]
+        if row.size > 1:
+            self._fit_x_origin(view_index, row[0], (row[-1] - row[0]) / (row.size - 1))
+        elif row.size == 1:
+            self._fit_x_origin(view_index, row[0], 1.0)
+        return x - self.x_origin[view_index]
+
+    def _check_camera_origin(self, view_index):
+        # Called on every camera change, only flags the view. The render timer re-bases it, see on_render_timer()
+        if self._camera_far_from_origin(view_index):
+            self.origin_rebase_pending.add(view_index)
+
+    def _camera_far_from_origin(self, view_index):
+        # Panned far from the origin, the scene transform would lose precision in float32
+        rect = self.view_boxes[view_index].camera.rect
+        center = rect.left + rect.width / 2
+        return rect.width > 0 and abs(center) > 2**10 * rect.width
+
+    def _rebase_camera_origin(self, view_index):
+        # Re-base on the view center
+        if self._camera_far_from_origin(view_index):
+            rect = self.view_boxes[view_index].camera.rect
+            self.set_x_origin(view_index, self.x_origin[view_index] + rect.left + rect.width / 2)
+
+    #
+    # Line sets
+    def add_line_set(self, n_lines, n_per_line, view_index=None, lod=False, t0=0.0, dt=None, capacity=None,
+                     stacked=False, spacing=1.0):
+        """
+        Add a set of n_lines lines with room for n_per_line samples each, drawn with one visual in the view.
+
+        capacity reserves room for more lines added later with add_lines(), past it the storage doubles. With
+        stacked the lines are drawn as separate traces spacing apart, line 0 on top, see set_stacked().
+
+        With dt set the lines are uniformly sampled, x = t0 + i * dt is computed on the GPU from the vertex index
+        and only y values are stored and uploaded. x_data given to update_line is then only used for its start
+        and step. With lod the samples are kept at full resolution on the CPU and drawn as a min/max envelope
+        matching the view's pixel width.
+        """
         if view_index is not None:
             self.selected_view_index = view_index
+        if dt is not None:
+            self._fit_x_origin(self.selected_view_index, t0, dt)
 
-        if self.selected_view_index in self.data_sets:
-            self.data_sets[self.selected_view_index][0] = np.empty(shape=(n_lines, n_per_line, 2), dtype=np.float32)
-            self.data_sets[self.selected_view_index][1] = np.empty(shape=(n_lines, n_per_line, 4), dtype=np.float32)
+        if lod:
+            self._add_lod_line_set(n_lines, n_per_line, t0=t0, dt=dt, capacity=capacity)
         else:
-            self.data_sets[self.selected_view_index] = [
-                np.empty(shape=(n_lines, n_per_line, 2), dtype=np.float32),  # vertex coordinates
-                np.empty(shape=(1, 0, 2), dtype=np.float32),  # if a image
-            ]
-
-        n_tot = n_lines * (n_per_line + 1)
-        pos = np.zeros((n_tot, 2), dtype=np.float32)
-        pos[:] = np.nan
-        color = np.ones((n_tot, 4), dtype=np.float32)
-        line = scene.visuals.Line(pos=pos, color=color, method='gl')
-        self.lines[self.selected_view_index] = line
-        self.view_boxes[self.selected_view_index].add(line)
-
-    def add_image(self, img_shape, view_index=None):
+            line = LineSet(
+                n_lines, n_per_line, x_start=t0 - self.x_origin[self.selected_view_index], x_step=dt,
+                capacity=capacity,
+            )
+            self.lines[self.selected_view_index] = line
+            self.view_boxes[self.selected_view_index].add(line)
+        # Offsets and gains live in the table of the drawn line set, the level-of-detail display included
+        if stacked:
+            self.set_stacked(self.selected_view_index, spacing=spacing)
+
+    def _add_lod_line_set(self, n_lines, n_per_line, t0=0.0, dt=None, capacity=None):
+        # Samples stay on the CPU with a min/max pyramid per line, the visual only holds an envelope of the visible
+        # range, about two vertices per pixel column, rebuilt on every camera change
+        view_index = self.selected_view_index
+        self.lod_line_sets[view_index] = LodLineSet(n_lines, n_per_line, capacity=capacity)
+        if dt is not None:
+            self.lod_line_sets[view_index].x_start[:] = t0
+            self.lod_line_sets[view_index].x_step[:] = dt
+        line = LineSet(n_lines, 2 * self.lod_max_width, capacity=capacity)
+        self.lines[view_index] = line
+        self.view_boxes[view_index].add(line)
+        self.view_boxes[view_index].scene.transform.changed.connect(
+            lambda event, i=view_index: self._update_lod_display(i)
+        )
+
+    def open_recording(self, path, view_index=None, n_channels=1, dtype=np.float32, sample_rate=1.0, t0=0.0,
+                       offset=0, channels_first=False):
+        """
+        Show a recording file (.npy or raw interleaved binary) in a view without loading it, see RecordingFile.
+
+        The file is memory mapped and every camera change pages in only what the visible envelope needs. On the
+        first open the min/max summary file is built by a worker thread, the view is decimated by striding until it
+        is done. => the RecordingFile
+        """
         if view_index is not None:
             self.selected_view_index = view_index
+        view_index = self.selected_view_index
+
+        recording = RecordingFile(
+            path, n_channels=n_channels, dtype=dtype, sample_rate=sample_rate, t0=t0, offset=offset,
+            channels_first=channels_first,
+        )
+        self.recordings[view_index] = recording
+        self._fit_x_origin(view_index, t0, 1.0 / sample_rate)
+        line = LineSet(recording.n_lines, 2 * self.lod_max_width)
+        for i in range(recording.n_lines):
+            line.set_line_color(i, self._color_to_rgba(ColorsCyclic.get_color()))
+            line.set_line_visible(i)
+        self.lines[view_index] = line
+        self.view_boxes[view_index].add(line)
+        self.view_boxes[view_index].scene.transform.changed.connect(
+            lambda event, i=view_index: self._update_lod_display(i)
+        )
+
+        if not recording.summary_ready:
+            print(f" building min/max summary of {path}")
+            self.main_frame.init_thread_worker(
+                run_func=recording.build_summary, kwargs={},
+                callback_func=lambda event, i=view_index: self._recording_summary_done(i, event.data),
+            )
+        self._update_data_extents(view_index)
+        self.zoom_axis_home()
+        return recording
+
+    def _recording_summary_done(self, view_index, done):
+        print(f" min/max summary of view {view_index} built: {done}")
+        if done:
+            self._update_data_extents(view_index)
+            self._update_lod_display(view_index)
+            self.request_draw()
+
+    def add_image(self, img_shape, view_index=None, **kwargs):
+        """Add a scrolling image of shape (n_rows, n_columns), see add_waterfall()."""
+        self.add_waterfall(*img_shape, view_index=view_index, **kwargs)
+
+    def add_waterfall(self, n_rows, n_columns, view_index=None, x_range=None, y_range=None, clim=(0.0, 1.0),
+                      cmap='viridis'):
+        """
+        Add a waterfall (e.g. spectrogram) image with n_rows bins along y and a history of n_columns along x.
+
+        The image is a 2d texture used as a ring buffer of columns, append_waterfall_columns() uploads only the new
+        columns and scrolls by moving a texture coordinate offset. x_range and y_range place the image in data
+        coordinates, the column and row index by default.
+        """
+        if view_index is not None:
+            self.selected_view_index = view_index
+
+        if x_range is not None:
+            origin = self.x_origin[self.selected_view_index]
+            x_range = (x_range[0] - origin, x_range[1] - origin)
+        image = Waterfall(n_rows, n_columns, x_range=x_range, y_range=y_range, clim=clim, cmap=cmap)
+        image.order = -1  # Behind the lines of the view
+        self.images[self.selected_view_index] = image
+        self.view_boxes[self.selected_view_index].add(image)
+        self._update_data_extents(self.selected_view_index)
+        self.request_draw()
+
+    def add_persistence(self, n_columns, n_rows, x_range, y_range, view_index=None, decay_time=1.0, cmap='hot'):
+        """
+        Add a persistence display: segments given to add_persistence_segments() are binned into a decaying hit
+        count histogram of n_rows x n_columns cells covering x_range and y_range, shown as a colormapped image.
+
+        The histogram is uploaded by the render timer at most once per frame, however many segments arrive.
+        """
+        if view_index is not None:
+            self.selected_view_index = view_index
+        self.persistence[self.selected_view_index] = PersistenceHistogram(
+            n_columns, n_rows, y_range, decay_time=decay_time
+        )
+        self.add_waterfall(n_rows, n_columns, x_range=x_range, y_range=y_range, cmap=cmap)
+
+    def add_persistence_segments(self, view_index, segments):
+        """Bin (n_segments, n_samples) aligned segments into the view's persistence histogram."""
+        self.persistence[view_index].add_segments(segments)
+        self.request_draw()
+
+    def clear_persistence(self, view_index):
+        self.persistence[view_index].clear()
+        self.request_draw()
+
+    def _update_persistence_images(self):
+        # Decay and upload once per frame, keep drawing while there is something left to fade. Held while paused
+        if not self.play:
+            return
+        for view_index, histogram in self.persistence.items():
+            image = self.images[view_index]
+            if not image.visible:
+                continue
+            histogram.decay()
+            counts = histogram.get_image()
+            image.set_image(counts)
+            image.set_clim((0.0, max(float(counts.max()), 1.0)))
+            if histogram.counts.max() > 0.01:
+                self.draw_pending = True
 
     def add_vertical_line(self, pos=0, view_index=None, color=(1.0, 1.0, 1.0, 1.0)):
-        l = scene.InfiniteLine(pos, color)
-        self.view_boxes[view_index].add(l)
-        self.vertical_lines.append(l)
+        marker_id = self.add_marker(pos, view_index=view_index, orientation='vertical', color=color)
+        self.vertical_lines.append((self.selected_view_index, marker_id))
+        return len(self.vertical_lines) - 1
+
+    def add_horizontal_line(self, pos=0, view_index=None, color=(1.0, 1.0, 1.0, 1.0)):
+        marker_id = self.add_marker(pos, view_index=view_index, orientation='horizontal', color=color)
+        self.horizontal_lines.append((self.selected_view_index, marker_id))
+        return len(self.horizontal_lines) - 1
+
+    def _get_marker_set(self, view_index):
+        if view_index not in self.marker_sets:
+            self.marker_sets[view_index] = MarkerSet()
+            self.view_boxes[view_index].add(self.marker_sets[view_index])
+        return self.marker_sets[view_index]
+
+    def add_marker(self, pos, view_index=None, orientation='vertical', color=(1.0, 1.0, 1.0, 1.0), label=None):
+        """Add one vertical (at x = pos) or horizontal (y = pos) marker line => marker id, see add_markers()."""
+        return int(self.add_markers(
+            [pos], view_index=view_index, orientation=orientation, color=color,
+            labels=None if label is None else [label],
+        )[0])
+
+    def add_markers(self, positions, view_index=None, orientation='vertical', color=(1.0, 1.0, 1.0, 1.0),
+                    labels=None):
+        """
+        Add marker lines (e.g. events or triggers) spanning the view => array of marker ids.
+
+        All markers of a view are drawn by one MarkerSet visual, adding and removing only uploads the slots touched.
+        color is one color for all markers or one per marker, labels is None or one string (or None) per marker.
+        """
+        if view_index is not None:
+            self.selected_view_index = view_index
+        color = self._colors_to_rgba(color)
+
+        marker_set = self._get_marker_set(self.selected_view_index)
+        if orientation == 'vertical':
+            positions = np.asarray(positions, dtype=np.float64) - self.x_origin[self.selected_view_index]
+        ids = marker_set.add_markers(positions, orientation=orientation, color=color, labels=labels)
+        if labels is not None:
+            self._update_marker_labels(self.selected_view_index)
+        self.request_draw()
+        return ids
 
     #
     # Update plot widgets
@@ -363,47 +829,586 @@ class VispyPanel(wx.Panel):
         if view_index is not None:
             self.selected_view_index = view_index
 
-        # We have 1 ekstra vertex for splitting the lines visually
-        n_data = self.data_sets[self.selected_view_index][0].shape[1]
-        start_indx = n_data * line_index + line_index
-        end_indx = start_indx + n_data + 1
-
-        pos = self.lines[view_index].pos
-        color_arr = self.lines[view_index].color
+        if self.selected_view_index in self.lod_line_sets:
+            self._update_lod_line(self.selected_view_index, line_index, y_data, x_data, color)
+            return
 
+        line = self.lines[self.selected_view_index]
+        if color is not None:
+            color = self._color_to_rgba(color)
+        x_data = self._fit_x_origin_to_rows(self.selected_view_index, x_data)
+
+        line.set_line(line_index, x_data=x_data, y_data=y_data, color=color)
+        self._update_data_extents(self.selected_view_index)
+        self.request_draw()
+
+    def set_line_offset_gain(self, view_index, line_indices, offset=None, gain=None):
+        """
+        Draw lines as y * gain + offset. Applied in the vertex shader from the line table, the samples and the
+        cursor readouts keep the original values. offset and gain are scalars or one value per line.
+        """
+        self.lines[view_index].set_line_transforms(line_indices, offset=offset, gain=gain)
+        self._update_data_extents(view_index)
+        self.request_draw()
+
+    def set_stacked(self, view_index, spacing=1.0, stacked=True):
+        """Stack the lines of a view spacing apart (line 0 on top) with unit gain, or overlay them again."""
+        line = self.lines[view_index]
+        line_indices = np.arange(line.n_lines)
+        if stacked:
+            self.stacked_spacing[view_index] = spacing
+            offsets = -line_indices * spacing
+        else:
+            self.stacked_spacing.pop(view_index, None)
+            offsets = 0.0
+        self.set_line_offset_gain(view_index, line_indices, offset=offsets, gain=1.0)
+
+    def autoscale_stacked(self, view_index, fill=0.8):
+        """
+        Scale every trace of a stacked view to fill a fraction of its slot, centered on it.
+
+        Gains come from the cached per line extents, so this is O(n_lines). A streamed line's extents only widen
+        until the line is rewritten, call it again after big level changes.
+        """
+        spacing = self.stacked_spacing.get(view_index, 1.0)
+        if view_index in self.lod_line_sets:
+            extents = self.lod_line_sets[view_index].get_line_extents()
+        else:
+            extents = self.lines[view_index].get_raw_extents()
+        y_min, y_max = extents[:, 2], extents[:, 3]
+        span = y_max - y_min
+        has_span = np.isfinite(span) & (span > 0)
+        gain = np.ones(extents.shape[0])
+        gain[has_span] = fill * spacing / span[has_span]
+        center = np.where(has_span, (y_min + y_max) / 2, 0.0)
+        slots = -np.arange(extents.shape[0]) * spacing
+        self.set_line_offset_gain(view_index, np.arange(extents.shape[0]), offset=slots - center * gain, gain=gain)
+
+    def add_lines(self, view_index, n_new=1, colors=None):
+        """
+        Add n_new empty lines to a view's line set while it is in use => their line indices.
+
+        Existing lines keep their data and GPU buffers, slots of removed lines are reused first. New lines of a
+        uniformly sampled set take its t0 and dt.
+        """
+        self.selected_view_index = view_index
+        line = self.lines[view_index]
+        indices = line.add_lines(n_new)
+        if view_index in self.lod_line_sets:
+            # Same slot bookkeeping as the display line set, so both hand out the same indices
+            lod_set = self.lod_line_sets[view_index]
+            lod_set.add_lines(n_new, x_start=lod_set.x_start[0], x_step=lod_set.x_step[0])
+        for i, line_index in enumerate(indices):
+            color = ColorsCyclic.get_color() if colors is None else colors[i]
+            line.set_line_color(line_index, self._color_to_rgba(color))
+        if view_index in self.stacked_spacing:
+            line.set_line_transforms(indices, offset=-np.array(indices) * self.stacked_spacing[view_index], gain=1.0)
+        self.request_draw()
+        return indices
+
+    def remove_line(self, line_index, view_index=None):
+        """Clear and drop a line, other line indices stay the same."""
+        if view_index is not None:
+            self.selected_view_index = view_index
+        self.lines[self.selected_view_index].remove_line(line_index)
+        if self.selected_view_index in self.lod_line_sets:
+            self.lod_line_sets[self.selected_view_index].remove_line(line_index)
+        self._update_data_extents(self.selected_view_index)
+        self.request_draw()
+
+    def add_acquisition_modes(self, view_index, n_samples, mode='normal', n_average=16, alpha=0.1):
+        """
+        Feed the view's lines through selectable acquisition modes, see FrameAcquisition and update_frame().
+
+        The lower envelope gets its own lines, added once here with the style of the lines they belong to and only
+        shown in envelope mode, so switching modes later allocates nothing.
+        """
+        line = self.lines[view_index]
+        n_lines = line.n_lines
+        acquisition = FrameAcquisition(n_lines, n_samples, mode=mode, n_average=n_average, alpha=alpha)
+        lower_lines = self.add_lines(view_index, n_lines)
+        line.copy_line_style(np.arange(n_lines), lower_lines)
+        for lower_line in lower_lines:
+            line.set_line_alpha(lower_line, 0.5)
+        self.acquisitions[view_index] = (acquisition, lower_lines)
+        self.set_acquisition_mode(view_index, mode)
+
+    def set_acquisition_mode(self, view_index, mode):
+        """Switch mode (normal, peak_hold, envelope, average, exp_average), the accumulated state is reset."""
+        acquisition, lower_lines = self.acquisitions[view_index]
+        acquisition.set_mode(mode)
+        line = self.lines[view_index]
+        visible = line.get_visible()
+        for upper_line, lower_line in enumerate(lower_lines):
+            line.set_line_visible(lower_line, mode == 'envelope' and visible[upper_line])
+        self.request_draw()
+
+    def update_frame(self, view_index, frame, x=None):
+        """Pass a new (n_lines, n_samples) frame through the view's acquisition mode and show the result."""
+        acquisition, lower_lines = self.acquisitions[view_index]
+        upper, lower = acquisition.process(np.asarray(frame, dtype=np.float32))
+        x = self._fit_x_origin_to_rows(view_index, x)
+        line = self.lines[view_index]
+        line.set_lines(y_data=upper, x_data=x)
+        if lower is not None:
+            for i, lower_line in enumerate(lower_lines):
+                line.set_line(lower_line, x_data=x, y_data=lower[i])
+        self._update_data_extents(view_index)
+        self.request_draw()
+
+    def update_lines(self, view_index, y_matrix, x=None):
+        """
+        Update all lines of a line set at once.
+
+        y_matrix is an (n_lines, n_samples) array, row i goes to line i of the set from add_line_set. x is either
+        one x row shared by all lines or an (n_lines, n_samples) array. The rows are written in one vectorized
+        operation and the view gets a single upload.
+        """
+        self.selected_view_index = view_index
+        y_matrix = np.asarray(y_matrix, dtype=np.float32)
+        if x is not None:
+            x = np.asarray(x, dtype=np.float64)
+
+        if view_index in self.lod_line_sets:
+            lod_set = self.lod_line_sets[view_index]
+            x_start = x_step = None
+            if x is not None and x.shape[-1] > 1:
+                x_rows = np.atleast_2d(x)
+                x_start, x_step = x_rows[:, 0], (x_rows[:, -1] - x_rows[:, 0]) / (x_rows.shape[1] - 1)
+            for line_index in range(min(y_matrix.shape[0], lod_set.n_lines)):
+                lod_set.set_line(
+                    line_index, y_data=y_matrix[line_index],
+                    x_start=None if x_start is None else x_start[line_index % x_start.size],
+                    x_step=None if x_step is None else x_step[line_index % x_step.size],
+                )
+            self._update_lod_display(view_index)
+            self._update_data_extents(view_index)
+            self.request_draw()
+            return
+
+        x = self._fit_x_origin_to_rows(view_index, x)
+        self.lines[view_index].set_lines(y_data=y_matrix, x_data=x)
+        self._update_data_extents(view_index)
+        self.request_draw()
+
+    def _update_lod_line(self, view_index, line_index, y_data=None, x_data=None, color=None):
+        # x_data of a level-of-detail line is only used for its start and (uniform) step
+        lod_set = self.lod_line_sets[view_index]
+        x_start = x_step = None
         if x_data is not None:
-            self.data_sets[self.selected_view_index][0][line_index, :x_data.size, 0] = x_data[:]
-            pos[start_indx:start_indx+x_data.size, 0] = x_data[:]
-            pos[start_indx+x_data.size: end_indx, 0] = np.nan
-
-        if y_data is not None:
-            self.data_sets[self.selected_view_index][0][line_index, :y_data.size, 1] = y_data[:]
-            pos[start_indx:start_indx+y_data.size, 1] = y_data[:]
-            pos[start_indx+y_data.size: end_indx, 0] = np.nan
+            x_data = np.asarray(x_data, dtype=np.float64)
+        if x_data is not None and x_data.size > 1:
+            x_start, x_step = x_data[0], (x_data[-1] - x_data[0]) / (x_data.size - 1)
+        lod_set.set_line(line_index, y_data=y_data, x_start=x_start, x_step=x_step)
 
         if color is not None:
-            c = wx.Colour(color)
-            r, g, b = c.Red(), c.Green(), c.Blue()
+            self.lines[view_index].set_line(line_index, color=self._color_to_rgba(color))
+        self._update_lod_display(view_index, line_indices=(line_index, ))
+        self._update_data_extents(view_index)
+        self.request_draw()
+
+    def _get_lod_source(self, view_index):
+        # (level-of-detail data, display line set) of a view, the history while paused
+        if view_index in self.recordings:
+            return self.recordings[view_index], self.lines[view_index]
+        if not self.play and view_index in self.history_sets:
+            return self.history_sets[view_index], self.history_displays[view_index]
+        if view_index in self.lod_line_sets:
+            return self.lod_line_sets[view_index], self.lines[view_index]
+        return None, None
+
+    def _update_lod_display(self, view_index, line_indices=None):
+        lod_set, line = self._get_lod_source(view_index)
+        if lod_set is None:
+            return
+        # The level-of-detail data is kept in absolute float64 x, the display in offsets from the view's origin
+        view_box = self.view_boxes[view_index]
+        origin = self.x_origin[view_index]
+        x0, x1 = view_box.camera.rect.left + origin, view_box.camera.rect.right + origin
+        n_out = int(np.clip(view_box.width, 1, self.lod_max_width))
+
+        if line_indices is None:
+            line_indices = range(lod_set.n_lines)
+        for line_index in line_indices:
+            x_data, y_data = lod_set.envelope(line_index, x0, x1, n_out)
+            line.set_line(line_index, x_data=x_data - origin, y_data=y_data)
 
-            color_arr[start_indx:end_indx, :] = np.array([r, g, b, 255], dtype=np.float32) / 255
-            self.lines[view_index].set_data(pos=pos, color=color_arr)
+    @staticmethod
+    def _color_to_rgba(color):
+        # Float (r, g, b[, a]) sequences are used as they are, anything else goes through wx.Colour
+        if isinstance(color, (tuple, list, np.ndarray)) and len(color) in (3, 4) and max(color) <= 1.0:
+            return np.array(color, dtype=np.float32)
+        c = wx.Colour(color)
+        return np.array([c.Red(), c.Green(), c.Blue(), c.Alpha()], dtype=np.float32) / 255
+
+    @classmethod
+    def _colors_to_rgba(cls, color):
+        # One color or a sequence of them, in any form _color_to_rgba takes => (n, 4) rgba, alpha 1 if not given
+        if isinstance(color, (str, wx.Colour)) or (np.ndim(color) == 1 and not isinstance(color[0], str)):
+            color = [color]
+        rgba = [cls._color_to_rgba(c) for c in color]
+        return np.array([np.append(c, 1.0) if c.size == 3 else c for c in rgba], dtype=np.float32)
+
+    def append_samples(self, view_index, line_index, samples):
+        """
+        Append new samples to a line used as a circular buffer.
+
+        The line keeps the x grid from its last update_line call (uniform spacing assumed, sample index if never
+        set), new samples enter at the right and the oldest drop out at the left. Only the new samples are written
+        and uploaded, so the cost per call scales with samples.size and not with the line length.
+        """
+        self.selected_view_index = view_index
+        line = self.lines[view_index]
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.size == 0:
+            return
+
+        if view_index in self.history_sets:
+            self.history_sets[view_index].append(line_index, samples)
+            if not self.play:
+                self.history_paused_samples[view_index][line_index] += samples.size
+                self._place_history(view_index)
+
+        if view_index in self.lod_line_sets:
+            self.lod_line_sets[view_index].append(line_index, samples)
         else:
-            self.lines[view_index].set_data(pos=pos)
+            line.append(line_index, samples)
+        if view_index in self.lod_line_sets or (not self.play and view_index in self.history_sets):
+            self._update_lod_display(view_index, line_indices=(line_index, ))
+        self._update_data_extents(view_index)
+        self.request_draw()
 
-        non_nans_mask = ~np.isnan(pos[:, 1]) & ~np.isnan(pos[:, 0])
-
-        self.x_data_min[self.selected_view_index] = np.amin(pos[non_nans_mask, 0])
-        self.x_data_max[self.selected_view_index] = np.amax(pos[non_nans_mask, 0])
-        self.y_data_min[self.selected_view_index] = np.amin(pos[non_nans_mask, 1])
-        self.y_data_max[self.selected_view_index] = np.amax(pos[non_nans_mask, 1])
+    #
+    # Pause and scrollback
+    def add_history(self, view_index, n_history):
+        """
+        Keep the last n_history samples of every streamed line of a view for scrollback while paused.
+
+        Samples given to append_samples() are also written to a history ring with min/max pyramids, so zoomed out
+        views of the whole history stay cheap. The lines must be uniformly sampled (dt given to add_line_set).
+        """
+        live = self.lines[view_index]
+        self.history_sets[view_index] = LodLineSet(live.n_lines, n_history)
+        self.history_paused_samples[view_index] = np.zeros(live.n_lines, dtype=np.int64)
+        display = LineSet(live.n_lines, 2 * self.lod_max_width)
+        display.visible = False
+        self.history_displays[view_index] = display
+        self.view_boxes[view_index].add(display)
+        if view_index not in self.lod_line_sets:
+            self.view_boxes[view_index].scene.transform.changed.connect(
+                lambda event, i=view_index: self._update_lod_display(i)
+            )
+        self._place_history(view_index)
+
+    def _place_history(self, view_index):
+        # The newest history sample sits on the newest live sample, moved right by the samples appended while
+        # paused, so the history stays fixed in x while it keeps filling
+        history = self.history_sets[view_index]
+        if view_index in self.lod_line_sets:
+            lod_set = self.lod_line_sets[view_index]
+            n_live, x_start, x_step = lod_set.n_per_line, lod_set.x_start, lod_set.x_step
+        else:
+            live = self.lines[view_index]
+            n_live, x_step = live.n_per_line, live.line_table[:, 0, 2]
+            x_start = live.line_table[:, 0, 1] + self.x_origin[view_index]
+        n = history.n_lines
+        x_step = x_step[:n].astype(np.float64)
+        newest = x_start[:n] + (n_live - 1) * x_step
+        history.x_step[:n] = x_step
+        history.x_start[:n] = newest + (self.history_paused_samples[view_index] - (history.n_per_line - 1)) * x_step
+
+    def pause(self):
+        """
+        Freeze the display, acquisition goes on. Views with a history show it for scrollback, the line sets and
+        images of all other views keep their data on the CPU and upload nothing until resume().
+        """
+        self.play = False
+        for view_index, line in self.lines.items():
+            if view_index not in self.history_displays and view_index not in self.recordings:
+                line.frozen = True
+        for image in self.images.values():
+            image.frozen = True
+        for view_index, display in self.history_displays.items():
+            live = self.lines[view_index]
+            self.history_paused_samples[view_index][:] = 0
+            self._place_history(view_index)
+            # The history display takes the style the live lines have now
+            n = display.n_lines
+            visible = live.get_visible()
+            for line_index in range(n):
+                display.set_line_color(line_index, live.line_table[line_index, 1])
+                display.set_line_visible(line_index, visible[line_index])
+            offset, gain = live.get_line_transforms()
+            display.set_line_transforms(np.arange(n), offset[:n], gain[:n])
+            live.visible = False
+            display.visible = True
+            self._update_lod_display(view_index)
+        for view_box in self.view_boxes:
+            view_box.border_color = self.pause_color
+        self.request_draw()
+
+    def resume(self):
+        """
+        Back to the live data at its head. The live line sets kept receiving samples while paused, their pending
+        uploads are flushed with the next draw, nothing is copied to catch up.
+        """
+        self.play = True
+        for line in self.lines.values():
+            line.frozen = False
+        for image in self.images.values():
+            image.frozen = False
+        for view_index, display in self.history_displays.items():
+            display.visible = False
+            self.lines[view_index].visible = True
+            if view_index in self.lod_line_sets:
+                self._update_lod_display(view_index)
+            # Jump to the live x range, keep the y range
+            self._update_data_extents(view_index)
+            if not np.isfinite(self.x_data_max[view_index] - self.x_data_min[view_index]):
+                continue
+            rect = self.view_boxes[view_index].camera.rect
+            self.view_boxes[view_index].camera.set_range(
+                x=(self.x_data_min[view_index], self.x_data_max[view_index]), y=(rect.bottom, rect.top), margin=0,
+            )
+        for view_box in self.view_boxes:
+            view_box.border_color = self.play_color
+        self.request_draw()
+
+    def toggle_play(self):
+        if self.play:
+            self.pause()
+        else:
+            self.resume()
+
+    def append_waterfall_columns(self, view_index, columns):
+        """Scroll new columns into a waterfall image, shape (n_rows, ) for one column or (n_new, n_rows)."""
+        self.images[view_index].append_columns(columns)
+        self.request_draw()
+
+    def update_image(self, view_index, data=None, clim=None, x_range=None, y_range=None):
+        """Replace the whole waterfall image (n_rows, n_columns, oldest column first), its color limits or ranges."""
+        image = self.images[view_index]
+        if data is not None:
+            image.set_image(data)
+        if clim is not None:
+            image.set_clim(clim)
+        if x_range is not None or y_range is not None:
+            image.set_ranges(x_range=x_range, y_range=y_range)
+            self._update_data_extents(view_index)
+        self.request_draw()
+
+    def get_data_arrays(self, view_index):
+        """
+        The arrays holding the samples of a view's line set, there is no other copy.
+
+        Returns (x, y, heads), views of the rows of the n_lines line slots in use (removed slots included, see
+        remove_line), the spare capacity rows are left out. For a normal line set x and y are the vertex arrays of
+        the visual, float32 with shape (n_lines, n_per_line + 1), column n_per_line is the gap vertex splitting the
+        lines. It is nan, or a copy of the first slot once a line written by append_samples has wrapped. x is None
+        when the set uses an implicit x axis (dt given to add_line_set), otherwise it holds offsets from the view's
+        x origin (x_origin). For a level-of-detail set x is None and y is the full resolution (n_lines, n_per_line)
+        array. Lines written by append_samples are circular, logical sample k is stored at
+        (heads[line] + k) % n_per_line.
+
+        The arrays can be read or written in place, call lines_written() after writing so the GPU and the cached
+        extents catch up. Adding lines past the capacity moves the data, get the arrays again after add_lines().
+        """
+        if view_index in self.lod_line_sets:
+            lod_set = self.lod_line_sets[view_index]
+            n = lod_set.n_lines
+            return None, lod_set.y[:n], lod_set.heads[:n]
+        line = self.lines[view_index]
+        n = line.n_lines
+        x = None if line.x is None else line.x[:n]
+        return x, line.y[:n], line.line_table[:n, 0, 0].astype(np.int64)
+
+    def lines_written(self, view_index, line_indices=None, start=0, stop=None):
+        """Tell the view samples [start, stop) of the given lines were written in place, see get_data_arrays()."""
+        if view_index in self.lod_line_sets:
+            lod_set = self.lod_line_sets[view_index]
+            if line_indices is None:
+                line_indices = range(lod_set.n_lines)
+            stop = lod_set.n_per_line if stop is None else stop
+            for line_index in line_indices:
+                lod_set.pyramids[line_index].update(start, stop)
+            self._update_lod_display(view_index, line_indices=line_indices)
+        else:
+            self.lines[view_index].lines_written(line_indices, start, stop)
+        self._update_data_extents(view_index)
+        self.request_draw()
+
+    def _update_data_extents(self, view_index):
+        # Merge the cached per line extents, O(n_lines) and independent of the number of samples
+        lod_set, line = self._get_lod_source(view_index)
+        if lod_set is not None:
+            line_extents = lod_set.get_line_extents()
+            line_extents[:, 0:2] -= self.x_origin[view_index]
+            extents = line.get_extents(line_extents)
+        elif view_index in self.lines:
+            extents = self.lines[view_index].get_extents()
+        else:
+            extents = (np.inf, -np.inf, np.inf, -np.inf)
+        if view_index in self.images:
+            image = self.images[view_index]
+            extents = (
+                min(extents[0], *image.x_range), max(extents[1], *image.x_range),
+                min(extents[2], *image.y_range), max(extents[3], *image.y_range),
+            )
+        if np.isfinite(extents[0]) and np.isfinite(extents[1]):
+            self.x_data_min[view_index], self.x_data_max[view_index] = extents[0], extents[1]
+        if np.isfinite(extents[2]) and np.isfinite(extents[3]):
+            self.y_data_min[view_index], self.y_data_max[view_index] = extents[2], extents[3]
+
+    def get_cursor_values(self, view_index, x, interpolate=False):
+        """
+        Value of every line of a view at x => (x, y) arrays with one entry per line, nan where a line has no data.
+
+        Uniformly sampled lines are looked up with the index formula and other lines with a binary search, nothing
+        here scans the samples. x and the returned x values are absolute, not relative to the view's x origin.
+        """
+        lod_set, line = self._get_lod_source(view_index)
+        if lod_set is not None:
+            x_values, y_values = lod_set.sample_at(x, interpolate=interpolate)
+            hidden = ~line.get_visible()[:x_values.size]
+            x_values[hidden], y_values[hidden] = np.nan, np.nan
+            return x_values, y_values
+        if view_index in self.lines:
+            origin = self.x_origin[view_index]
+            x_values, y_values = self.lines[view_index].sample_at(x - origin, interpolate=interpolate)
+            return x_values + origin, y_values
+        return np.empty(0), np.empty(0)
+
+    def update_cursor_readout(self):
+        for i, text in enumerate(self.cursor_texts):
+            if i != self.mouse_over_plot and text.text != '':
+                text.text = ''
+                self.request_draw()
+        if self.mouse_over_plot < 0:
+            return
+
+        origin = self.x_origin[self.mouse_over_plot]
+        x_values, y_values = self.get_cursor_values(
+            self.mouse_over_plot, self.mouse_x + origin, interpolate=self.cursor_interpolate
+        )
+        has_value = np.flatnonzero(np.isfinite(y_values))
+        if has_value.size == 0:
+            readout = ''
+        else:
+            # As many digits as one pixel of the view resolves
+            view_box = self.view_boxes[self.mouse_over_plot]
+            resolution = view_box.camera.rect.width / max(view_box.size[0], 1)
+            digits = significant_digits(x_values[has_value[0]], resolution, min_digits=6)
+            readout = f'x = {x_values[has_value[0]]:.{digits}g}' + ''.join(
+                f'\nline {i}: {y_values[i]:.4g}' for i in has_value
+            )
+        self.cursor_texts[self.mouse_over_plot].text = readout
+        self.request_draw()
 
     def hide_line(self, line_index, view_index=None):
+        """Hide a line, its samples stay in place (and keep streaming) and only one table row is uploaded."""
+        self.set_line_visible(line_index, False, view_index=view_index)
+
+    def show_line(self, line_index, view_index=None):
+        self.set_line_visible(line_index, True, view_index=view_index)
+
+    def set_line_visible(self, line_index, visible=True, view_index=None):
+        if view_index is not None:
+            self.selected_view_index = view_index
+        self.lines[self.selected_view_index].set_line_visible(line_index, visible)
+        if self.selected_view_index in self.acquisitions:
+            # The lower envelope line follows its line, only in envelope mode
+            acquisition, lower_lines = self.acquisitions[self.selected_view_index]
+            if line_index < len(lower_lines):
+                self.lines[self.selected_view_index].set_line_visible(
+                    lower_lines[line_index], visible and acquisition.mode == 'envelope'
+                )
+        self._update_data_extents(self.selected_view_index)
+        self.request_draw()
+
+    def toggle_line(self, line_index, view_index=None):
+        if view_index is not None:
+            self.selected_view_index = view_index
+        visible = self.lines[self.selected_view_index].get_visible()[line_index]
+        self.set_line_visible(line_index, not visible)
+        return not visible
+
+    def set_line_color(self, line_index, color, view_index=None, alpha=None):
         if view_index is not None:
             self.selected_view_index = view_index
+        line = self.lines[self.selected_view_index]
+        line.set_line_color(line_index, self._color_to_rgba(color))
+        if alpha is not None:
+            line.set_line_alpha(line_index, alpha)
+        self.request_draw()
 
     def update_vertical_line(self, line_index, view_index=None, pos=None, color=None):
+        marker_view_index, marker_id = self.vertical_lines[line_index]
+        self.update_marker(marker_id, view_index=marker_view_index, pos=pos, color=color)
+
+    def update_horizontal_line(self, line_index, view_index=None, pos=None, color=None):
+        marker_view_index, marker_id = self.horizontal_lines[line_index]
+        self.update_marker(marker_id, view_index=marker_view_index, pos=pos, color=color)
+
+    def update_marker(self, marker_id, view_index=None, pos=None, color=None, label=None):
+        if view_index is not None:
+            self.selected_view_index = view_index
+        if color is not None:
+            color = self._colors_to_rgba(color)[0]
+        marker_set = self.marker_sets[self.selected_view_index]
+        if pos is not None and marker_set.is_vertical(marker_id):
+            pos = pos - self.x_origin[self.selected_view_index]
+        marker_set.update_marker(marker_id, position=pos, color=color, label=label)
+        if label is not None or (pos is not None and self.selected_view_index in self.marker_labels):
+            self._update_marker_labels(self.selected_view_index)
+        self.request_draw()
+
+    def remove_markers(self, marker_ids, view_index=None):
+        if view_index is not None:
+            self.selected_view_index = view_index
+        self.marker_sets[self.selected_view_index].remove_markers(marker_ids)
+        if self.selected_view_index in self.marker_labels:
+            self._update_marker_labels(self.selected_view_index)
+        self.request_draw()
+
+    def clear_markers(self, view_index=None):
         if view_index is not None:
             self.selected_view_index = view_index
+        if self.selected_view_index in self.marker_sets:
+            self.marker_sets[self.selected_view_index].clear()
+            if self.selected_view_index in self.marker_labels:
+                self._update_marker_labels(self.selected_view_index)
+            self.request_draw()
+
+    def _update_marker_labels(self, view_index):
+        # All labels of the view in one text visual, placed at the top (vertical) or left (horizontal) view edge
+        marker_set = self.marker_sets[view_index]
+        labelled = [slot for slot, label in enumerate(marker_set.labels) if label is not None]
+        if view_index not in self.marker_labels:
+            if len(labelled) == 0:
+                return
+            text = scene.visuals.Text(
+                '', color='w', font_size=7, anchor_x='left', anchor_y='top', parent=self.view_boxes[view_index].scene
+            )
+            self.marker_labels[view_index] = text
+            self.view_boxes[view_index].scene.transform.changed.connect(
+                lambda event, i=view_index: self._update_marker_labels(i)
+            )
+        text = self.marker_labels[view_index]
+        if len(labelled) == 0:
+            text.visible = False
+            return
+
+        rect = self.view_boxes[view_index].camera.rect
+        positions, orientations = marker_set.get_positions()
+        positions, orientations = positions[labelled], orientations[labelled]
+        pos = np.empty((len(labelled), 2), dtype=np.float32)
+        pos[:, 0] = np.where(orientations < 0.5, positions, rect.left)
+        pos[:, 1] = np.where(orientations < 0.5, rect.top, positions)
+        labels = [marker_set.labels[slot] for slot in labelled]
+        if text.text != labels:
+            text.text = labels
+        text.pos = pos
+        text.visible = True
 
     def zoom_axis_home(self):
         i = self.selected_view_index
@@ -0,0 +1,365 @@
+import queue
+import time
+
+import numpy as np
+
+
+class StftEngine:
+    """
+    Streaming short time Fourier transform of a multi channel signal.
+
+    Blocks of shape (n_channels, n_samples) go in through put() (any thread) or process(), finished spectra come
+    out as an (n_spectra, n_channels, n_bins) float32 array, averaged over n_average frames and in dB when db is set.
+    The window, the frame buffer and the averaging accumulator are allocated once, every call transforms all frames
+    of all channels with a single batched rfft.
+    """
+    def __init__(self, n_channels, n_fft=1024, overlap=0.5, n_average=1, sample_rate=1.0, db=True, max_frames=256):
+        self.n_channels = n_channels
+        self.n_fft = n_fft
+        self.hop = max(1, int(round(n_fft * (1 - overlap))))
+        self.n_average = max(1, n_average)
+        self.sample_rate = sample_rate
+        self.db = db
+        self.n_bins = n_fft // 2 + 1
+        self.frequencies = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+
+        # Power spectrum scaling of the window, one sided
+        self.window = np.hanning(n_fft).astype(np.float32)
+        self.scale = np.float32(2 / (sample_rate * np.sum(self.window ** 2)))
+
+        # Samples not yet consumed by a frame, grown by doubling when a large block arrives
+        self.pending = np.zeros((n_channels, n_fft + max_frames * self.hop), dtype=np.float32)
+        self.n_pending = 0
+        self.max_frames = max_frames
+        self.frames = np.empty((n_channels, max_frames, n_fft), dtype=np.float32)
+        self.average = np.zeros((n_channels, self.n_bins), dtype=np.float64)
+        self.n_averaged = 0
+
+        self.input_queue = queue.Queue()
+        self.n_samples_processed = 0
+        self.processing_time = 0.0
+
+    def put(self, block):
+        """Queue a block for the worker, safe to call from the GUI thread."""
+        self.input_queue.put(np.asarray(block, dtype=np.float32))
+
+    def _append_pending(self, block):
+        n_new = block.shape[1]
+        if self.n_pending + n_new > self.pending.shape[1]:
+            size = self.pending.shape[1]
+            while size < self.n_pending + n_new:
+                size *= 2
+            pending = np.zeros((self.n_channels, size), dtype=np.float32)
+            pending[:, :self.n_pending] = self.pending[:, :self.n_pending]
+            self.pending = pending
+        self.pending[:, self.n_pending:self.n_pending + n_new] = block
+        self.n_pending += n_new
+
+    def process(self, block):
+        """Add a block of samples, returns the spectra finished by it (may be empty)."""
+        t0 = time.perf_counter()
+        block = np.asarray(block, dtype=np.float32).reshape(self.n_channels, -1)
+        self._append_pending(block)
+
+        spectra = []
+        while self.n_pending >= self.n_fft:
+            n_frames = min(self.max_frames, (self.n_pending - self.n_fft) // self.hop + 1)
+            windows = np.lib.stride_tricks.sliding_window_view(
+                self.pending[:, :self.n_pending], self.n_fft, axis=1
+            )[:, :n_frames * self.hop:self.hop]
+            frames = self.frames[:, :n_frames]
+            np.multiply(windows, self.window, out=frames)
+            power = np.abs(np.fft.rfft(frames, axis=-1)) ** 2 * self.scale  # (n_channels, n_frames, n_bins)
+
+            # Drop consumed samples, the rest moves to the front of the pending buffer
+            consumed = n_frames * self.hop
+            self.pending[:, :self.n_pending - consumed] = self.pending[:, consumed:self.n_pending]
+            self.n_pending -= consumed
+
+            if self.n_average == 1:
+                spectra.append(power.transpose(1, 0, 2))
+            else:
+                spectra.extend(self._average(power))
+
+        self.n_samples_processed += block.shape[1]
+        self.processing_time += time.perf_counter() - t0
+        if len(spectra) == 0:
+            return np.empty((0, self.n_channels, self.n_bins), dtype=np.float32)
+        spectra = np.concatenate(spectra).astype(np.float32)
+        if self.db:
+            np.log10(np.maximum(spectra, 1e-20), out=spectra)
+            spectra *= 10
+        return spectra
+
+    def _average(self, power):
+        # Whole groups of n_average frames are summed at once, the remainder is carried to the next call
+        averaged = []
+        i, n_frames = 0, power.shape[1]
+        while i < n_frames:
+            take = min(self.n_average - self.n_averaged, n_frames - i)
+            self.average += power[:, i:i + take].sum(axis=1)
+            self.n_averaged += take
+            i += take
+            if self.n_averaged == self.n_average:
+                averaged.append((self.average / self.n_average)[np.newaxis])
+                self.average[:] = 0
+                self.n_averaged = 0
+        return averaged
+
+    def run_worker(self, thread_instance=None):
+        """Worker loop body for MainFrame.init_thread_worker, processes everything queued so far."""
+        blocks = []
+        while True:
+            try:
+                blocks.append(self.input_queue.get_nowait())
+            except queue.Empty:
+                break
+        if len(blocks) == 0:
+            return None
+        return self.process(np.concatenate(blocks, axis=-1))
+
+    def get_throughput(self):
+        """Samples per second (per channel) the engine has processed while busy."""
+        if self.processing_time == 0:
+            return 0.0
+        return self.n_samples_processed / self.processing_time
+
+    def reset(self):
+        self.n_pending = 0
+        self.average[:] = 0
+        self.n_averaged = 0
+        self.n_samples_processed = 0
+        self.processing_time = 0.0
+
+
+class EdgeTrigger:
+    """
+    Edge trigger with hysteresis and holdoff on one source channel of a multi channel stream.
+
+    A rising trigger fires where the source reaches level after having been below level - hysteresis since it was
+    last at or above level (mirrored for falling edges). Crossings are found for a whole block with cumulative
+    maximum of the last low/high sample index, only accepted triggers are iterated for the holdoff. The latest
+    samples are kept in a ring buffer so a segment can start pre_trigger samples before its trigger, also in an
+    earlier block. process() returns the finished (n_segments, n_channels, pre_trigger + post_trigger) segments.
+    """
+    def __init__(self, n_channels, pre_trigger=512, post_trigger=1536, level=0.0, hysteresis=0.0, edge='rising',
+                 holdoff=None, source_channel=0, max_segments=16):
+        self.n_channels = n_channels
+        self.pre_trigger = pre_trigger
+        self.post_trigger = post_trigger
+        self.segment_length = pre_trigger + post_trigger
+        self.level = level
+        self.hysteresis = hysteresis
+        self.edge = edge
+        self.holdoff = self.segment_length if holdoff is None else holdoff
+        self.source_channel = source_channel
+        self.max_segments = max_segments
+
+        self.ring = np.zeros((n_channels, 4 * self.segment_length), dtype=np.float32)
+        self.n_written = 0  # Total samples seen, sample s is stored at s % ring size
+        self.last_low = -1  # Absolute index of the last sample armed below the hysteresis band
+        self.last_high = -1  # Absolute index of the last sample at or above the level
+        self.last_trigger = -self.holdoff - 1
+        self.pending_triggers = np.empty(0, dtype=np.int64)  # Waiting for their post trigger samples
+        self.trigger_fractions = np.empty(0, dtype=np.float64)  # Sub sample position of the crossing, per segment
+
+    def set_level(self, level, hysteresis=None):
+        self.level = level
+        if hysteresis is not None:
+            self.hysteresis = hysteresis
+
+    def _write(self, block):
+        n_new = block.shape[1]
+        size = self.ring.shape[1]
+        if n_new + self.segment_length > size:
+            # Grow so the block plus a whole segment before it fit, kept in the same absolute position mapping
+            new_size = size
+            while n_new + self.segment_length > new_size:
+                new_size *= 2
+            keep = min(self.n_written, size)
+            old = np.arange(self.n_written - keep, self.n_written)
+            ring = np.zeros((self.n_channels, new_size), dtype=np.float32)
+            ring[:, old % new_size] = self.ring[:, old % size]
+            self.ring, size = ring, new_size
+        self.ring[:, (self.n_written + np.arange(n_new)) % size] = block
+
+    def _find_triggers(self, x, first_index):
+        if self.edge == 'falling':
+            x, level = -x, -self.level
+        else:
+            level = self.level
+        index = first_index + np.arange(x.size)
+        low = x < level - self.hysteresis
+        high = x >= level
+
+        last_low = np.maximum.accumulate(np.where(low, index, -1))
+        np.maximum(last_low, self.last_low, out=last_low)
+        last_high = np.maximum.accumulate(np.where(high, index, -1))
+        np.maximum(last_high, self.last_high, out=last_high)
+        previous_high = np.concatenate(([self.last_high], last_high[:-1]))
+
+        self.last_low, self.last_high = int(last_low[-1]), int(last_high[-1])
+        return index[high & (last_low > previous_high)]
+
+    def _apply_holdoff(self, candidates):
+        accepted = []
+        next_allowed = self.last_trigger + self.holdoff
+        i = np.searchsorted(candidates, next_allowed)
+        while i < candidates.size:
+            trigger = int(candidates[i])
+            accepted.append(trigger)
+            next_allowed = trigger + self.holdoff
+            i = np.searchsorted(candidates, next_allowed, side='left')
+        if len(accepted) > 0:
+            self.last_trigger = accepted[-1]
+        return np.array(accepted, dtype=np.int64)
+
+    def process(self, block):
+        block = np.asarray(block, dtype=np.float32).reshape(self.n_channels, -1)
+        first_index = self.n_written
+        self._write(block)
+        self.n_written += block.shape[1]
+
+        triggers = self._apply_holdoff(self._find_triggers(block[self.source_channel], first_index))
+        # Triggers too early to have their pre trigger samples are dropped
+        triggers = triggers[triggers - self.pre_trigger >= max(0, self.n_written - self.ring.shape[1])]
+        triggers = np.concatenate((self.pending_triggers, triggers))
+
+        complete = triggers + self.post_trigger <= self.n_written
+        self.pending_triggers = triggers[~complete]
+        triggers = triggers[complete][-self.max_segments:]
+        if triggers.size == 0:
+            return np.empty((0, self.n_channels, self.segment_length), dtype=np.float32)
+
+        # Fancy index gather of all segments at once, (n_segments, n_channels, segment_length)
+        size = self.ring.shape[1]
+        columns = (triggers[:, np.newaxis] - self.pre_trigger + np.arange(self.segment_length)) % size
+        segments = self.ring[:, columns].transpose(1, 0, 2)
+
+        # Position of the level crossing between the trigger sample and the one before it
+        source = self.ring[self.source_channel]
+        before, after = source[(triggers - 1) % size], source[triggers % size]
+        span = after - before
+        span[span == 0] = 1
+        self.trigger_fractions = np.clip((after - self.level) / span, 0, 1).astype(np.float64)
+        return segments
+
+    def reset(self):
+        self.n_written = 0
+        self.last_low = self.last_high = -1
+        self.last_trigger = -self.holdoff - 1
+        self.pending_triggers = np.empty(0, dtype=np.int64)
+
+
+class PersistenceHistogram:
+    """
+    Hit count image of many aligned segments, for an oscilloscope style persistence display.
+
+    Segments of equal length are binned into counts, shape (n_rows, n_columns): column from the sample index, row
+    from the value within y_range. All samples of all segments go through one np.bincount. The counts decay
+    exponentially with decay_time seconds, so old hits fade out while a glitch seen once stays visible for a while.
+    """
+    def __init__(self, n_columns, n_rows, y_range, decay_time=1.0):
+        self.n_columns = n_columns
+        self.n_rows = n_rows
+        self.y_range = y_range
+        self.decay_time = decay_time
+        self.counts = np.zeros((n_rows, n_columns), dtype=np.float32)
+        self.last_decay = time.perf_counter()
+        self.n_segments = 0
+        self._columns = None  # Column of every sample, cached per segment length
+
+    def add_segments(self, segments):
+        """Add (n_segments, n_samples) segments, or one 1d segment."""
+        segments = np.atleast_2d(segments)
+        n_samples = segments.shape[1]
+        if self._columns is None or self._columns.size != n_samples:
+            self._columns = (np.arange(n_samples) * self.n_columns // n_samples).astype(np.int64)
+
+        y0, y1 = self.y_range
+        rows = np.floor((segments - y0) * (self.n_rows / (y1 - y0)))
+        inside = (rows >= 0) & (rows < self.n_rows)
+        flat = rows.astype(np.int64) * self.n_columns + self._columns
+        hits = np.bincount(flat[inside], minlength=self.n_rows * self.n_columns)
+
+        self.decay()
+        self.counts += hits.reshape(self.n_rows, self.n_columns)
+        self.n_segments += segments.shape[0]
+
+    def decay(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.decay_time is not None and self.decay_time > 0:
+            self.counts *= np.float32(np.exp(-(now - self.last_decay) / self.decay_time))
+        self.last_decay = now
+
+    def get_image(self):
+        """Log scaled counts for display, 0 where there are no hits."""
+        return np.log1p(self.counts)
+
+    def clear(self):
+        self.counts[:] = 0
+        self.n_segments = 0
+
+
+class FrameAcquisition:
+    """
+    Acquisition modes over successive frames of shape (n_lines, n_samples), e.g. triggered segments.
+
+    normal shows the last frame, peak_hold the running maximum, envelope the running maximum and minimum,
+    average the mean of the last n_average frames and exp_average an exponential average with weight alpha for
+    the newest frame. All buffers are allocated once, switching mode only resets them and each frame costs one
+    in-place vectorized update (two for the envelope). process() returns the frame to display and, for the
+    envelope, the lower bound (None otherwise); both are internal buffers, overwritten by the next call.
+    """
+    modes = ('normal', 'peak_hold', 'envelope', 'average', 'exp_average')
+
+    def __init__(self, n_lines, n_samples, mode='normal', n_average=16, alpha=0.1):
+        self.n_average = n_average
+        self.alpha = np.float32(alpha)
+        shape = (n_lines, n_samples)
+        self.upper = np.empty(shape, dtype=np.float32)  # Last frame, maximum or average, depending on mode
+        self.lower = np.empty(shape, dtype=np.float32)
+        self.history = np.empty((n_average, ) + shape, dtype=np.float32)  # Ring of frames for average
+        self.sum = np.zeros(shape, dtype=np.float64)
+        self.scratch = np.empty(shape, dtype=np.float32)
+        self.mode = mode
+        self.reset()
+
+    def set_mode(self, mode):
+        if mode not in self.modes:
+            raise ValueError(f'unknown acquisition mode {mode}, use one of {self.modes}')
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        self.n_frames = 0
+        self.upper.fill(-np.inf if self.mode in ('peak_hold', 'envelope') else 0.0)
+        self.lower.fill(np.inf)
+        self.sum.fill(0.0)
+
+    def process(self, frame):
+        mode = self.mode
+        if mode == 'normal':
+            np.copyto(self.upper, frame)
+        elif mode == 'peak_hold':
+            np.maximum(self.upper, frame, out=self.upper)
+        elif mode == 'envelope':
+            np.maximum(self.upper, frame, out=self.upper)
+            np.minimum(self.lower, frame, out=self.lower)
+        elif mode == 'average':
+            # Running sum over a ring of the last n_average frames, the oldest frame is subtracted as it drops out
+            slot = self.n_frames % self.n_average
+            if self.n_frames >= self.n_average:
+                self.sum -= self.history[slot]
+            self.sum += frame
+            self.history[slot] = frame
+            np.divide(self.sum, min(self.n_frames + 1, self.n_average), out=self.upper, casting='unsafe')
+        elif mode == 'exp_average':
+            if self.n_frames == 0:
+                np.copyto(self.upper, frame)
+            else:
+                np.subtract(frame, self.upper, out=self.scratch)
+                self.scratch *= self.alpha
+                self.upper += self.scratch
+        self.n_frames += 1
+        return self.upper, self.lower if mode == 'envelope' else None
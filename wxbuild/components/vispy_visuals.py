@@ -0,0 +1,780 @@
+import numpy as np
+from vispy import gloo, visuals
+from vispy.color import get_colormap
+from vispy.scene.visuals import create_visual_node
+
+from wxbuild.components.data_buffers import ring_write, nan_range, nan_ranges, sample_at_uniform, sample_at_sorted
+
+
+# Break value for the v_keep varying, any fragment on a segment touching a vertex with this value is discarded
+LINE_BREAK = -1e6
+# Mark value for the v_seam varying, two (end, start) pairs. A segment from a vertex marked as an end to one marked
+# as a start of the same pair has both components far from zero between its vertices and is discarded, the
+# segments on the other sides of the two vertices are kept
+LINE_SEAM = 1e6
+
+LINE_SET_VERTEX_SHADER = """
+attribute vec2 a_index;  // (line index, sample index)
+%(x_attribute)s
+attribute float a_y;
+
+uniform sampler2D u_line_table;
+uniform float u_n_lines;
+uniform float u_n_per_line;
+
+varying vec4 v_color;
+varying float v_keep;
+varying vec4 v_seam;
+
+void main() {
+    float line = a_index.x;
+    float sample = a_index.y;
+
+    // Per line table => ring state (write head, x start, x step, x from sample index), color,
+    // style (visible, y offset, y gain, unused)
+    float row = (line + 0.5) / u_n_lines;
+    vec4 ring = texture2D(u_line_table, vec2(0.5 / 3.0, row));
+    vec4 color = texture2D(u_line_table, vec2(1.5 / 3.0, row));
+    vec4 style = texture2D(u_line_table, vec2(2.5 / 3.0, row));
+
+    v_keep = 1.0;
+    // (newest sample, oldest sample) of a wrapped ring, (gap vertex, first slot) between two lines
+    v_seam = vec4(0.0);
+    if (sample < 0.5) {
+        v_seam.w = %(line_seam)s;
+    }
+    if (sample > u_n_per_line - 0.5) {
+        v_seam.z = %(line_seam)s;
+    }
+    float x = %(x_default)s;
+    bool wrapped = ring.w > 0.5 && ring.x > 0.5;
+    if (ring.w > 0.5) {
+        // Oldest sample at the write head, newest just behind it. The gap vertex gets k = n - head, the position
+        // of the first slot it mirrors, so the last slot joins the first one and only newest to oldest is cut
+        float k = mod(sample - ring.x + u_n_per_line, u_n_per_line);
+        x = ring.y + k * ring.z;
+        if (wrapped && sample < u_n_per_line - 0.5) {
+            if (k > u_n_per_line - 1.5) {
+                v_seam.x = %(line_seam)s;
+            }
+            if (k < 0.5) {
+                v_seam.y = %(line_seam)s;
+            }
+        }
+    }
+    if ((sample > u_n_per_line - 0.5 && !wrapped) || style.x < 0.5) {
+        v_keep = %(line_break)s;  // gap vertex splitting the strip into lines, or a hidden line
+    }
+
+    v_color = color;
+    gl_Position = $transform(vec4(x, a_y * style.z + style.y, 0.0, 1.0));
+}
+"""
+
+LINE_SET_FRAGMENT_SHADER = """
+varying vec4 v_color;
+varying float v_keep;
+varying vec4 v_seam;
+
+void main() {
+    if (v_keep < 0.0 || (v_seam.x > 0.5 && v_seam.y > 0.5) || (v_seam.z > 0.5 && v_seam.w > 0.5)) {
+        discard;
+    }
+    gl_FragColor = v_color;
+}
+"""
+
+
+def merge_spans(spans):
+    """Sort (start, stop) spans and merge the ones overlapping or touching."""
+    merged = []
+    for start, stop in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if stop > merged[-1][1]:
+                merged[-1][1] = stop
+        else:
+            merged.append([start, stop])
+    return merged
+
+
+class LineSetVisual(visuals.Visual):
+    """
+    All lines of one view drawn with a single line strip.
+
+    The arrays x and y (x is None with an implicit x axis) are the only copy of the samples, float32 and C
+    contiguous with shape (n_lines, n_per_line + 1). They are uploaded as they are, line by line, and the last
+    vertex of each line is a gap vertex splitting the strip. A line can be used as a circular buffer through
+    append(), the write head is kept in a per line table read by the vertex shader so the window scrolls without
+    moving any data on the CPU. Once the buffer has wrapped, the gap vertex holds a copy of the first slot, which
+    follows the last slot in time. Color, alpha and visibility live in the same table, one row per line.
+
+    Writes only mark vertex ranges as dirty, the ranges are merged and sent to the GPU once in _prepare_draw, so
+    the upload size follows the lines actually changed since the last frame. Writes do not request a redraw either,
+    scheduling draws is left to the owner (see VispyPanel.request_draw).
+    """
+    def __init__(self, n_lines, n_per_line, x_start=0.0, x_step=None, capacity=None):
+        # With x_step set every line is uniformly sampled, x = x_start + i * x_step is computed in the vertex
+        # shader and no x coordinates are stored or uploaded at all
+        self.implicit_x = x_step is not None
+        vcode = LINE_SET_VERTEX_SHADER % {
+            'x_attribute': '' if self.implicit_x else 'attribute float a_x;',
+            'x_default': '0.0' if self.implicit_x else 'a_x',
+            'line_break': LINE_BREAK,
+            'line_seam': LINE_SEAM,
+        }
+        visuals.Visual.__init__(self, vcode=vcode, fcode=LINE_SET_FRAGMENT_SHADER)
+        self.n_lines = n_lines  # Line slots in use, the arrays have room for capacity lines
+        self.n_per_line = n_per_line
+        self.x_start, self.x_step = x_start, x_step
+        self.free_lines = []  # Removed line slots, reused first by add_lines()
+        self.frozen = False  # While set, draws keep the uploaded data and writes only pile up dirty ranges
+
+        self.capacity = 0
+        self.x = self.y = self.line_table = self.extents = None
+        self._allocate(max(n_lines, 1 if capacity is None else capacity))
+        self.line_table[:n_lines, 2, 0] = 1.0
+        self.shared_program['u_n_per_line'] = float(n_per_line)
+
+        self._draw_mode = 'line_strip'
+        self.set_gl_state('translucent', depth_test=False)
+
+    def _reset_rows(self, table_rows, extents_rows):
+        # Per line => [(write head, x start, x step, x from sample index), (r, g, b, a),
+        # (visible, y offset, y gain, 0)]. Color, visibility, offset and gain are only applied by the shader,
+        # changing them uploads one table row and never touches the samples
+        table_rows[:] = 0.0
+        table_rows[:, 0, 2] = 1.0
+        if self.implicit_x:
+            table_rows[:, 0, 1:] = self.x_start, self.x_step, 1.0
+        table_rows[:, 1] = 1.0
+        table_rows[:, 2, 2] = 1.0
+        # Per line data extents => (x min, x max, y min, y max), only updated from the slices written
+        extents_rows[:, 0::2] = np.inf
+        extents_rows[:, 1::2] = -np.inf
+
+    def _allocate(self, capacity):
+        """Room for capacity lines, existing lines are copied and all buffers are created and uploaded once."""
+        old_capacity = self.capacity
+        shape = (capacity, self.n_per_line + 1)
+        arrays = {'y': np.full(shape, np.nan, dtype=np.float32)}
+        if not self.implicit_x:
+            arrays['x'] = np.full(shape, np.nan, dtype=np.float32)
+        arrays['line_table'] = np.empty((capacity, 3, 4), dtype=np.float32)
+        arrays['extents'] = np.empty((capacity, 4), dtype=np.float64)
+        self._reset_rows(arrays['line_table'][old_capacity:], arrays['extents'][old_capacity:])
+        for name, array in arrays.items():
+            if old_capacity > 0:
+                array[:old_capacity] = getattr(self, name)
+            setattr(self, name, array)
+        self.capacity = capacity
+
+        index = np.empty(shape + (2,), dtype=np.float32)
+        index[..., 0] = np.arange(capacity)[:, None]
+        index[..., 1] = np.arange(self.n_per_line + 1)[None, :]
+
+        self._vbos = {'y': gloo.VertexBuffer(self.y.reshape(-1, 1))}
+        self._dirty_spans = {'y': []}
+        self._dirty_table_rows = set()
+        self._line_table_texture = gloo.Texture2D(
+            self.line_table, internalformat='rgba32f', interpolation='nearest'
+        )
+        self.shared_program['a_index'] = gloo.VertexBuffer(index.reshape(-1, 2))
+        if not self.implicit_x:
+            self._vbos['x'] = gloo.VertexBuffer(self.x.reshape(-1, 1))
+            self._dirty_spans['x'] = []
+            self.shared_program['a_x'] = self._vbos['x']
+        self.shared_program['a_y'] = self._vbos['y']
+        self.shared_program['u_line_table'] = self._line_table_texture
+        self.shared_program['u_n_lines'] = float(capacity)
+
+    def add_lines(self, n_new=1):
+        """
+        Take n_new line slots => their line indices, visible and empty.
+
+        Removed slots are reused first, then spare capacity. Only when that is used up the storage doubles, which
+        copies the existing lines once, so adding lines while streaming is amortized O(1) per line.
+        """
+        indices = sorted(self.free_lines)[:n_new]
+        self.free_lines = [i for i in self.free_lines if i not in indices]
+        n_rest = n_new - len(indices)
+        if self.n_lines + n_rest > self.capacity:
+            capacity = self.capacity
+            while capacity < self.n_lines + n_rest:
+                capacity *= 2
+            self._allocate(capacity)
+        indices.extend(range(self.n_lines, self.n_lines + n_rest))
+        self.n_lines += n_rest
+        for line_index in indices:
+            self.set_line_visible(line_index, True)
+        return indices
+
+    def remove_line(self, line_index):
+        """Clear and hide a line, its slot is reused by add_lines(). Other line indices do not change."""
+        for name in ('x', 'y'):
+            data = getattr(self, name)
+            if data is not None:
+                data[line_index] = np.nan
+                self._mark_dirty(name, line_index)
+        self._reset_rows(self.line_table[line_index:line_index + 1], self.extents[line_index:line_index + 1])
+        self._dirty_table_rows.add(line_index)
+        if line_index not in self.free_lines:
+            self.free_lines.append(line_index)
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+    def _prepare_draw(self, view):
+        if not self.frozen:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Upload the dirty vertex ranges and line table rows."""
+        for name, spans in self._dirty_spans.items():
+            if len(spans) == 0:
+                continue
+            data = getattr(self, name).reshape(-1, 1)
+            for start, stop in merge_spans(spans):
+                self._vbos[name].set_subdata(data[start:stop], offset=start)
+            spans.clear()
+
+        if len(self._dirty_table_rows) > 0:
+            for start, stop in merge_spans([(row, row + 1) for row in self._dirty_table_rows]):
+                self._line_table_texture.set_data(self.line_table[start:stop], offset=(start, 0))
+            self._dirty_table_rows.clear()
+
+    def _mark_dirty(self, name, line_index, start=0, stop=None):
+        if stop is None:
+            stop = self.n_per_line + 1
+        offset = line_index * (self.n_per_line + 1)
+        spans = self._dirty_spans[name]
+        spans.append((offset + start, offset + stop))
+        if len(spans) > 1024:  # many writes between two draws, e.g. while the panel is hidden
+            spans[:] = [tuple(span) for span in merge_spans(spans)]
+
+    #
+    def set_line(self, line_index, x_data=None, y_data=None, color=None):
+        if x_data is not None:
+            x_data = x_data[:self.n_per_line]
+            if x_data.size > 1:
+                x_step = (x_data[-1] - x_data[0]) / (x_data.size - 1)
+                self.line_table[line_index, 0, 1:3] = x_data[0], x_step
+            if self.implicit_x:
+                # Only the start and step of the x data are kept
+                self.extents[line_index, 0:2] = self.get_line_x_range(line_index)
+            else:
+                self.x[line_index, :x_data.size] = x_data
+                self.x[line_index, x_data.size:] = np.nan
+                self.extents[line_index, 0:2] = nan_range(x_data)
+                self._mark_dirty('x', line_index)
+                # Explicit x again, a line that was appended to stops taking x from start and step
+                self.line_table[line_index, 0, 3] = 0.0
+
+        if y_data is not None:
+            y_data = y_data[:self.n_per_line]
+            self.y[line_index, :y_data.size] = y_data
+            self.y[line_index, y_data.size:] = np.nan
+            self.extents[line_index, 2:4] = nan_range(y_data)
+            if self.implicit_x:
+                self.extents[line_index, 0:2] = self.get_line_x_range(line_index)
+            self._mark_dirty('y', line_index)
+            # Writing the samples of a whole line restarts it from the first slot
+            self.line_table[line_index, 0, 0] = 0
+
+        if color is not None:
+            self.set_line_color(line_index, color)
+
+        self._dirty_table_rows.add(line_index)
+
+    def set_lines(self, y_data=None, x_data=None, first_line=0):
+        """
+        Write several consecutive lines at once, y_data is (n_lines, n_samples) and x_data is either one shared x
+        row or one row per line. Every buffer gets one dirty span covering all lines.
+        """
+        n_lines = self.n_lines - first_line
+        if y_data is not None:
+            n_lines = min(n_lines, y_data.shape[0])
+        elif x_data is not None and x_data.ndim == 2:
+            n_lines = min(n_lines, x_data.shape[0])
+        lines = slice(first_line, first_line + n_lines)
+
+        if x_data is not None:
+            x_data = np.atleast_2d(x_data)[:n_lines, :self.n_per_line]
+            n_x = x_data.shape[1]
+            if n_x > 1:
+                self.line_table[lines, 0, 1] = x_data[:, 0]
+                self.line_table[lines, 0, 2] = (x_data[:, -1] - x_data[:, 0]) / (n_x - 1)
+            if not self.implicit_x:
+                self.x[lines, :n_x] = x_data
+                self.x[lines, n_x:] = np.nan
+                self.extents[lines, 0], self.extents[lines, 1] = nan_ranges(x_data)
+                self.line_table[lines, 0, 3] = 0.0
+                self._mark_dirty('x', first_line, 0, n_lines * (self.n_per_line + 1))
+
+        if y_data is not None:
+            y_data = y_data[:n_lines, :self.n_per_line]
+            n_y = y_data.shape[1]
+            self.y[lines, :n_y] = y_data
+            self.y[lines, n_y:] = np.nan
+            self.extents[lines, 2], self.extents[lines, 3] = nan_ranges(y_data)
+            self._mark_dirty('y', first_line, 0, n_lines * (self.n_per_line + 1))
+            self.line_table[lines, 0, 0] = 0
+
+        if self.implicit_x:
+            x_start, x_step = self.line_table[lines, 0, 1], self.line_table[lines, 0, 2]
+            x_end = x_start + x_step * (self.n_per_line - 1)
+            self.extents[lines, 0], self.extents[lines, 1] = np.minimum(x_start, x_end), np.maximum(x_start, x_end)
+
+        self._dirty_table_rows.update(range(first_line, first_line + n_lines))
+
+    def lines_written(self, line_indices=None, start=0, stop=None):
+        """Upload samples [start, stop) of lines written in place and refresh their extents from that slice."""
+        if line_indices is None:
+            line_indices = range(self.n_lines)
+        stop = self.n_per_line if stop is None else stop
+        for line_index in line_indices:
+            for name in ('x', 'y'):
+                data = getattr(self, name)
+                if data is None:
+                    continue
+                self._mark_dirty(name, line_index, start, stop)
+                column = 0 if name == 'x' else 2
+                written_min, written_max = nan_range(data[line_index, start:stop])
+                if start == 0 and stop >= self.n_per_line:
+                    self.extents[line_index, column:column + 2] = written_min, written_max
+                else:
+                    self.extents[line_index, column] = min(self.extents[line_index, column], written_min)
+                    self.extents[line_index, column + 1] = max(self.extents[line_index, column + 1], written_max)
+            if self.implicit_x:
+                self.extents[line_index, 0:2] = self.get_line_x_range(line_index)
+            if start == 0 and self.line_table[line_index, 0, 3] > 0.5:
+                self._mirror_first_slot(line_index)
+
+    def append(self, line_index, samples):
+        """Append samples to the circular buffer of a line, the line's x grid stays fixed and the data scrolls."""
+        row = self.line_table[line_index, 0]
+        head, spans = ring_write(self.y[line_index, :self.n_per_line], int(row[0]), samples)
+        row[0] = head
+        row[3] = 1.0
+
+        for start, stop in spans:
+            self._mark_dirty('y', line_index, start, stop)
+            if start == 0:
+                self._mirror_first_slot(line_index)
+        self._dirty_table_rows.add(line_index)
+
+        # Samples dropping out are not looked at, the y extent of a streamed line can only grow until it is rewritten
+        y_min, y_max = nan_range(samples)
+        extents = self.extents[line_index]
+        extents[0:2] = self.get_line_x_range(line_index)
+        extents[2] = min(extents[2], y_min)
+        extents[3] = max(extents[3], y_max)
+
+        return spans
+
+    def _mirror_first_slot(self, line_index):
+        # The gap vertex of a wrapped circular buffer joins the last slot to the first one
+        n = self.n_per_line
+        self.y[line_index, n] = self.y[line_index, 0]
+        self._mark_dirty('y', line_index, n, n + 1)
+
+    def set_line_color(self, line_index, color):
+        """Set the (r, g, b) or (r, g, b, a) color of a line, only its table row is uploaded."""
+        color = np.asarray(color, dtype=np.float32)
+        self.line_table[line_index, 1, :color.size] = color
+        self._dirty_table_rows.add(line_index)
+
+    def copy_line_style(self, source_indices, target_indices):
+        """Give lines the color, visibility, offset and gain of other lines."""
+        self.line_table[target_indices, 1:] = self.line_table[source_indices, 1:]
+        self._dirty_table_rows.update(int(i) for i in np.atleast_1d(target_indices))
+
+    def set_line_alpha(self, line_index, alpha):
+        self.line_table[line_index, 1, 3] = alpha
+        self._dirty_table_rows.add(line_index)
+
+    def set_line_visible(self, line_index, visible=True):
+        self.line_table[line_index, 2, 0] = 1.0 if visible else 0.0
+        self._dirty_table_rows.add(line_index)
+
+    def set_line_transforms(self, line_indices, offset=None, gain=None):
+        """Vertical offset and gain of lines as drawn, y_drawn = y * gain + offset. Scalars or one per line."""
+        line_indices = np.atleast_1d(line_indices)
+        if offset is not None:
+            self.line_table[line_indices, 2, 1] = offset
+        if gain is not None:
+            self.line_table[line_indices, 2, 2] = gain
+        self._dirty_table_rows.update(int(i) for i in line_indices)
+
+    def get_line_transforms(self):
+        """(offset, gain) arrays of the lines in use."""
+        return self.line_table[:self.n_lines, 2, 1], self.line_table[:self.n_lines, 2, 2]
+
+    def get_visible(self):
+        return self.line_table[:, 2, 0] > 0.5
+
+    def get_extents(self, line_extents=None):
+        """
+        Extents of the visible lines as drawn (offset and gain applied) => (x min, x max, y min, y max), inf if
+        nothing is drawn yet. line_extents replaces the cached per line extents, e.g. for a level-of-detail display.
+        """
+        extents = self.extents[:self.n_lines] if line_extents is None else line_extents
+        style = self.line_table[:extents.shape[0], 2]
+        keep = (style[:, 0] > 0.5) & np.isfinite(extents[:, 2])
+        if not keep.any():
+            return np.inf, -np.inf, np.inf, -np.inf
+        extents, offset, gain = extents[keep], style[keep, 1], style[keep, 2]
+        y0, y1 = extents[:, 2] * gain + offset, extents[:, 3] * gain + offset
+        return (
+            extents[:, 0].min(), extents[:, 1].max(),
+            np.minimum(y0, y1).min(), np.maximum(y0, y1).max(),
+        )
+
+    def get_raw_extents(self):
+        """Cached per line extents of the samples => (n_lines, 4) array of (x min, x max, y min, y max)."""
+        return self.extents[:self.n_lines]
+
+    def sample_at(self, x, interpolate=False):
+        """
+        Value of every line at x => (x, y) arrays with one entry per line, nan where a line has no sample at x.
+
+        Lines on a uniform grid use the index formula, lines with explicit x a binary search, so the cost does not
+        grow with the number of samples per line.
+        """
+        n = self.n_per_line
+        table = self.line_table[:self.n_lines, 0].astype(np.float64)
+        x_out, y_out = sample_at_uniform(
+            self.y[:self.n_lines, :n], table[:, 0].astype(np.int64), table[:, 1], table[:, 2], x,
+            interpolate=interpolate,
+        )
+        if self.x is not None:
+            for line_index in np.flatnonzero(table[:, 3] < 0.5):
+                x_out[line_index], y_out[line_index] = sample_at_sorted(
+                    self.x[line_index, :n], self.y[line_index, :n], x, interpolate=interpolate
+                )
+        hidden = ~self.get_visible()[:self.n_lines]
+        x_out[hidden], y_out[hidden] = np.nan, np.nan
+        return x_out, y_out
+
+    def get_line_x_range(self, line_index):
+        x_start, x_step = self.line_table[line_index, 0, 1:3]
+        x_end = x_start + x_step * (self.n_per_line - 1)
+        return min(x_start, x_end), max(x_start, x_end)
+
+    def shift_x(self, offset):
+        """Move every line by offset along x, e.g. when the owner moves its x origin. All x values are uploaded."""
+        n = self.n_lines
+        # Free and spare rows too, and the start new rows get, lines added later land on the same grid
+        self.x_start += offset
+        self.line_table[:, 0, 1] += offset
+        self.extents[:n, 0:2] += offset
+        self._dirty_table_rows.update(range(self.capacity))
+        if self.x is not None:
+            self.x[:n, :self.n_per_line] += offset
+            self._mark_dirty('x', 0, 0, n * (self.n_per_line + 1))
+
+
+LineSet = create_visual_node(LineSetVisual)
+
+
+WATERFALL_VERTEX_SHADER = """
+attribute vec2 a_position;
+attribute vec2 a_texcoord;
+
+varying vec2 v_texcoord;
+
+void main() {
+    v_texcoord = a_texcoord;
+    gl_Position = $transform(vec4(a_position, 0.0, 1.0));
+}
+"""
+
+WATERFALL_FRAGMENT_SHADER = """
+uniform sampler2D u_texture;
+uniform sampler2D u_colormap;
+uniform float u_offset;  // write head of the column ring, in texture coordinates
+uniform vec2 u_clim;
+
+varying vec2 v_texcoord;
+
+void main() {
+    // The texture wraps in x, the oldest column (at the write head) ends up at the left edge
+    float value = texture2D(u_texture, vec2(v_texcoord.x + u_offset, v_texcoord.y)).r;
+    float t = clamp((value - u_clim.x) / (u_clim.y - u_clim.x), 0.0, 1.0);
+    gl_FragColor = texture2D(u_colormap, vec2(t, 0.5));
+}
+"""
+
+
+class WaterfallVisual(visuals.Visual):
+    """
+    Scrolling image, e.g. a spectrogram, kept in a 2d texture used as a ring buffer of columns.
+
+    Rows are y bins (e.g. frequency), columns are time. A new column overwrites the oldest one and only that column
+    is uploaded, the scroll is a texture coordinate offset in the fragment shader. data is the CPU copy of the
+    texture, shape (n_rows, n_columns) in ring order, the oldest column is at head.
+    """
+    def __init__(self, n_rows, n_columns, x_range=None, y_range=None, clim=(0.0, 1.0), cmap='viridis'):
+        visuals.Visual.__init__(self, vcode=WATERFALL_VERTEX_SHADER, fcode=WATERFALL_FRAGMENT_SHADER)
+        self.n_rows = n_rows
+        self.n_columns = n_columns
+        self.head = 0
+        self.data = np.zeros((n_rows, n_columns), dtype=np.float32)
+        self.x_range = (0, n_columns) if x_range is None else x_range
+        self.y_range = (0, n_rows) if y_range is None else y_range
+        # While frozen new columns only go to data, the whole texture is uploaded once at the first draw after
+        self.frozen = False
+        self._stale = False
+
+        self._texture = gloo.Texture2D(
+            self.data.reshape(n_rows, n_columns, 1), format='luminance', internalformat='r32f',
+            interpolation='nearest', wrapping='repeat',
+        )
+        colormap = get_colormap(cmap).map(np.linspace(0.0, 1.0, 256)).astype(np.float32)
+        self._colormap_texture = gloo.Texture2D(colormap.reshape(1, 256, 4), interpolation='linear')
+
+        self._position_vbo = gloo.VertexBuffer(self._quad())
+        texcoord = np.array([[0, 0], [1, 0], [0, 1], [1, 1]], dtype=np.float32)
+        self.shared_program['a_position'] = self._position_vbo
+        self.shared_program['a_texcoord'] = gloo.VertexBuffer(texcoord)
+        self.shared_program['u_texture'] = self._texture
+        self.shared_program['u_colormap'] = self._colormap_texture
+        self.shared_program['u_offset'] = 0.0
+        self.shared_program['u_clim'] = tuple(float(c) for c in clim)
+
+        self._draw_mode = 'triangle_strip'
+        self.set_gl_state('translucent', depth_test=False)
+
+    def _quad(self):
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+        return np.array([[x0, y0], [x1, y0], [x0, y1], [x1, y1]], dtype=np.float32)
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+    def _prepare_draw(self, view):
+        if self._stale and not self.frozen:
+            self._upload()
+        return True
+
+    def _upload(self):
+        self._stale = False
+        self._texture.set_data(self.data.reshape(self.n_rows, self.n_columns, 1))
+        self.shared_program['u_offset'] = self.head / self.n_columns
+
+    #
+    def append_columns(self, columns):
+        """Add new columns, shape (n_rows, ) or (n_new, n_rows). Only the written columns are uploaded."""
+        columns = np.atleast_2d(np.asarray(columns, dtype=np.float32))[-self.n_columns:, :self.n_rows]
+        n_new = columns.shape[0]
+        first = min(n_new, self.n_columns - self.head)
+        for start, block in ((self.head, columns[:first]), (0, columns[first:])):
+            if block.shape[0] == 0:
+                continue
+            self.data[:, start:start + block.shape[0]] = block.T
+            if self.frozen or self._stale:
+                self._stale = True
+                continue
+            self._texture.set_data(
+                np.ascontiguousarray(self.data[:, start:start + block.shape[0]]).reshape(self.n_rows, -1, 1),
+                offset=(0, start),
+            )
+        self.head = (self.head + n_new) % self.n_columns
+        if not self._stale:
+            self.shared_program['u_offset'] = self.head / self.n_columns
+
+    def set_image(self, data):
+        """Replace the whole image, columns in display order (oldest first)."""
+        self.data[:] = data
+        self.head = 0
+        self._stale = True
+        if not self.frozen:
+            self._upload()
+
+    def set_clim(self, clim):
+        self.shared_program['u_clim'] = tuple(float(c) for c in clim)
+
+    def set_ranges(self, x_range=None, y_range=None):
+        if x_range is not None:
+            self.x_range = x_range
+        if y_range is not None:
+            self.y_range = y_range
+        self._position_vbo.set_data(self._quad())
+
+
+Waterfall = create_visual_node(WaterfallVisual)
+
+
+MARKER_SET_VERTEX_SHADER = """
+attribute vec4 a_marker;  // (position, vertical 0 or horizontal 1, line end 0 or 1, keep)
+attribute vec4 a_color;
+
+varying vec4 v_color;
+varying float v_keep;
+
+void main() {
+    // Corner of the render area in visual coordinates, every marker spans the whole visible range
+    float end = a_marker.z * 2.0 - 1.0;
+    vec4 corner = $render_to_visual(vec4(end, end, 0.0, 1.0));
+    corner /= corner.w;
+    vec2 pos = a_marker.y < 0.5 ? vec2(a_marker.x, corner.y) : vec2(corner.x, a_marker.x);
+
+    v_color = a_color;
+    v_keep = a_marker.w;
+    gl_Position = $transform(vec4(pos, 0.0, 1.0));
+}
+"""
+
+
+def rgba_rows(color):
+    """One or several (r, g, b) or (r, g, b, a) colors => (n, 4) float32 array, alpha 1 where it is not given."""
+    color = np.asarray(color, dtype=np.float32)
+    color = color.reshape(-1, color.shape[-1])
+    if color.shape[1] == 3:
+        color = np.hstack((color, np.ones((color.shape[0], 1), dtype=np.float32)))
+    return color
+
+
+class MarkerSetVisual(visuals.Visual):
+    """
+    Vertical and horizontal marker lines of one view, all drawn with a single visual.
+
+    Each marker is one segment of two vertices stretched over the visible range in the vertex shader, so markers
+    stay valid when the camera moves. Markers are addressed by id, slots are packed: removing a marker moves the
+    last one into its slot. Storage doubles when full and only the changed slots are uploaded. Labels are kept per
+    slot in labels, drawing them is left to the owner.
+    """
+    def __init__(self, capacity=64):
+        visuals.Visual.__init__(self, vcode=MARKER_SET_VERTEX_SHADER, fcode=LINE_SET_FRAGMENT_SHADER)
+        self.n_markers = 0
+        self.next_id = 0
+        self.slots = {}  # marker id => slot
+        self.ids = []  # slot => marker id
+        self.labels = []  # slot => label or None
+        self._allocate(capacity)
+
+        self._draw_mode = 'lines'
+        self.set_gl_state('translucent', depth_test=False)
+
+    def _allocate(self, capacity):
+        # (capacity, 2 vertices, 4), unused slots have keep = -1 and are discarded
+        marker = np.zeros((capacity, 2, 4), dtype=np.float32)
+        marker[:, 1, 2] = 1.0
+        marker[:, :, 3] = LINE_BREAK
+        color = np.ones((capacity, 2, 4), dtype=np.float32)
+        if hasattr(self, 'marker'):
+            marker[:self.n_markers] = self.marker[:self.n_markers]
+            color[:self.n_markers] = self.color[:self.n_markers]
+        self.marker, self.color = marker, color
+        self.capacity = capacity
+
+        self._vbos = {
+            'marker': gloo.VertexBuffer(self.marker.reshape(-1, 4)),
+            'color': gloo.VertexBuffer(self.color.reshape(-1, 4)),
+        }
+        self._dirty_spans = {'marker': [], 'color': []}
+        self.shared_program['a_marker'] = self._vbos['marker']
+        self.shared_program['a_color'] = self._vbos['color']
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+        view.view_program.vert['render_to_visual'] = view.get_transform('render', 'visual')
+
+    def _prepare_draw(self, view):
+        self.flush()
+        return True
+
+    def flush(self):
+        for name, spans in self._dirty_spans.items():
+            if len(spans) == 0:
+                continue
+            data = getattr(self, name).reshape(-1, 4)
+            for start, stop in merge_spans(spans):
+                self._vbos[name].set_subdata(data[2 * start:2 * stop], offset=2 * start)
+            spans.clear()
+
+    def _mark_dirty(self, start, stop, names=('marker', 'color')):
+        for name in names:
+            spans = self._dirty_spans[name]
+            spans.append((start, stop))
+            if len(spans) > 1024:
+                spans[:] = [tuple(span) for span in merge_spans(spans)]
+
+    #
+    def add_markers(self, positions, orientation='vertical', color=(1.0, 1.0, 1.0, 1.0), labels=None):
+        """Add markers at positions (x for vertical, y for horizontal markers) => array of their ids."""
+        positions = np.atleast_1d(np.asarray(positions, dtype=np.float32))
+        n_new = positions.size
+        if self.n_markers + n_new > self.capacity:
+            capacity = self.capacity
+            while capacity < self.n_markers + n_new:
+                capacity *= 2
+            self._allocate(capacity)
+
+        slots = slice(self.n_markers, self.n_markers + n_new)
+        self.marker[slots, :, 0] = positions[:, np.newaxis]
+        self.marker[slots, :, 1] = 0.0 if orientation == 'vertical' else 1.0
+        self.marker[slots, :, 3] = 1.0
+        self.color[slots] = rgba_rows(color)[:, np.newaxis]
+
+        ids = np.arange(self.next_id, self.next_id + n_new)
+        self.next_id += n_new
+        for slot, marker_id in enumerate(ids, start=self.n_markers):
+            self.slots[int(marker_id)] = slot
+        self.ids.extend(int(marker_id) for marker_id in ids)
+        self.labels.extend([None] * n_new if labels is None else list(labels))
+        self._mark_dirty(self.n_markers, self.n_markers + n_new)
+        self.n_markers += n_new
+        return ids
+
+    def update_marker(self, marker_id, position=None, color=None, label=None):
+        slot = self.slots[marker_id]
+        if position is not None:
+            self.marker[slot, :, 0] = position
+            self._mark_dirty(slot, slot + 1, names=('marker', ))
+        if color is not None:
+            self.color[slot] = rgba_rows(color)[0]
+            self._mark_dirty(slot, slot + 1, names=('color', ))
+        if label is not None:
+            self.labels[slot] = label
+
+    def remove_markers(self, marker_ids):
+        for marker_id in marker_ids:
+            slot = self.slots.pop(marker_id)
+            last = self.n_markers - 1
+            if slot != last:
+                self.marker[slot] = self.marker[last]
+                self.color[slot] = self.color[last]
+                self.ids[slot], self.labels[slot] = self.ids[last], self.labels[last]
+                self.slots[self.ids[slot]] = slot
+                self._mark_dirty(slot, slot + 1)
+            self.marker[last, :, 3] = LINE_BREAK
+            self._mark_dirty(last, last + 1, names=('marker', ))
+            self.ids.pop()
+            self.labels.pop()
+            self.n_markers = last
+
+    def clear(self):
+        self.marker[:self.n_markers, :, 3] = LINE_BREAK
+        self._mark_dirty(0, self.n_markers, names=('marker', ))
+        self.n_markers = 0
+        self.slots.clear()
+        self.ids.clear()
+        self.labels.clear()
+
+    def get_positions(self):
+        """Positions and orientation (0 vertical, 1 horizontal) of the markers in slot order."""
+        return self.marker[:self.n_markers, 0, 0], self.marker[:self.n_markers, 0, 1]
+
+    def is_vertical(self, marker_id):
+        return bool(self.marker[self.slots[marker_id], 0, 1] < 0.5)
+
+    def shift(self, offset, orientation='vertical'):
+        """Move all markers of one orientation by offset."""
+        vertical = self.marker[:self.n_markers, 0, 1] < 0.5
+        moved = vertical if orientation == 'vertical' else ~vertical
+        self.marker[:self.n_markers][moved, :, 0] += offset
+        self._mark_dirty(0, self.n_markers, names=('marker', ))
+
+
+MarkerSet = create_visual_node(MarkerSetVisual)